@@ -0,0 +1,228 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+``CoalescingMiddleware`` keys GET/HEAD requests to the configured paths on
+method, path and query parameters (sorted by name). The first request for a
+key runs the endpoint in a task of its own and buffers the response; every
+identical request arriving before it finishes waits for and replays that
+same response instead of opening its own session and running its own
+queries. With ``cache_seconds`` the finished 200 response is also replayed
+for that long afterwards.
+
+Any other method is a write: it is never coalesced, drops the micro-cache,
+and bumps a generation counter on start and finish so that reads issued
+after a write never share a flight that started before it. This only
+orders writes seen by this process.
+
+If every client waiting on a flight disconnects, the flight is cancelled.
+Each response carries ``X-Coalesced: leader|joined|cached``.
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl
+
+COALESCED_METHODS = ("GET", "HEAD")
+# Expired micro-cache entries are pruned once it holds more than this
+CACHE_PRUNE_SIZE = 1024
+
+
+class CoalescingStats:
+    """Counters for coalesced paths, since startup."""
+
+    def __init__(self):
+        self.requests = 0
+        self.executed = 0
+        self.joined = 0
+        self.cached = 0
+
+    def as_dict(self) -> dict:
+        shared = self.joined + self.cached
+        return {
+            "requests": self.requests,
+            "executed": self.executed,
+            "joined": self.joined,
+            "cached": self.cached,
+            "coalescing_ratio": shared / self.requests if self.requests else 0,
+        }
+
+
+class _Response:
+    """A buffered ASGI response that can be sent any number of times."""
+
+    def __init__(self):
+        self.start = None
+        self.body = []
+
+    async def collect(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+        elif message["type"] == "http.response.body":
+            self.body.append(message.get("body", b""))
+
+    async def replay(self, send, outcome: bytes):
+        headers = list(self.start.get("headers", []))
+        headers.append((b"x-coalesced", outcome))
+        await send({**self.start, "headers": headers})
+        await send({"type": "http.response.body", "body": b"".join(self.body)})
+
+
+class _Flight:
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+
+async def _wait_for_disconnect(receive) -> bool:
+    """True once the client disconnects; False if it stops watching
+    because the server does not block ``receive()``."""
+    body_complete = False
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return True
+        if body_complete:
+            # Another http.request after the last body chunk: polling
+            # this server would spin, so stop watching
+            return False
+        body_complete = not message.get("more_body", False)
+
+
+class CoalescingMiddleware:
+    def __init__(
+        self,
+        app,
+        paths: Iterable[str] = (),
+        cache_seconds: float = 0,
+        stats: Optional[CoalescingStats] = None,
+    ):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.cache_seconds = cache_seconds
+        self.stats = stats or CoalescingStats()
+        self.generation = 0
+        self.flights: Dict[tuple, _Flight] = {}
+        self.cache: Dict[tuple, Tuple[float, _Response]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] not in COALESCED_METHODS:
+            self._invalidate()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self._invalidate()
+            return
+        if scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        self.stats.requests += 1
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.stats.cached += 1
+            await cached[1].replay(send, b"cached")
+            return
+
+        flight = self.flights.get(key)
+        if flight is None:
+            self.stats.executed += 1
+            flight = self._start(key, scope)
+            outcome = b"leader"
+        else:
+            self.stats.joined += 1
+            outcome = b"joined"
+        response = await self._wait(key, flight, receive)
+        if response is not None:
+            await response.replay(send, outcome)
+
+    def _key(self, scope) -> tuple:
+        params = parse_qsl(
+            scope["query_string"].decode("latin-1"), keep_blank_values=True
+        )
+        # Stable sort: repeated parameters keep their relative order
+        params.sort(key=lambda param: param[0])
+        return (self.generation, scope["method"], scope["path"], tuple(params))
+
+    def _invalidate(self):
+        self.generation += 1
+        self.cache.clear()
+
+    def _start(self, key: tuple, scope) -> _Flight:
+        flight = _Flight()
+        self.flights[key] = flight
+        flight.task = asyncio.ensure_future(self._run(key, flight, scope))
+        return flight
+
+    async def _run(self, key: tuple, flight: _Flight, scope):
+        """Run the endpoint once, detached from any one client."""
+        response = _Response()
+        request_sent = False
+        finished = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b""}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        try:
+            await self.app(dict(scope), receive, response.collect)
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except Exception as exc:
+            flight.future.set_exception(exc)
+        else:
+            flight.future.set_result(response)
+            if (
+                self.cache_seconds
+                and response.start["status"] == 200
+                and key[0] == self.generation
+            ):
+                self._cache(key, response)
+        finally:
+            finished.set()
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+
+    async def _wait(
+        self, key: tuple, flight: _Flight, receive
+    ) -> Optional[_Response]:
+        """The flight's response, or None if this client disconnected."""
+        flight.waiters += 1
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            done, _ = await asyncio.wait(
+                (flight.future, disconnect),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done and not disconnect.result():
+                # No disconnect will be reported; wait for the response
+                await asyncio.wait((flight.future,))
+        finally:
+            disconnect.cancel()
+            flight.waiters -= 1
+            if not flight.waiters and not flight.future.done():
+                # Nobody is left to answer
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+                flight.task.cancel()
+        if not flight.future.done():
+            return None
+        return flight.future.result()
+
+    def _cache(self, key: tuple, response: _Response):
+        now = time.monotonic()
+        if len(self.cache) >= CACHE_PRUNE_SIZE:
+            self.cache = {
+                cached_key: entry
+                for cached_key, entry in self.cache.items()
+                if entry[0] > now
+            }
+        self.cache[key] = (now + self.cache_seconds, response)
@@ -0,0 +1,49 @@
+from typing import Dict, List, Optional
+
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Runtime configuration, overridable through environment variables."""
+
+    database_url: str = "sqlite+aiosqlite:///./taskdb.db"
+    # Log every SQL statement (slow; for debugging only)
+    db_echo: bool = False
+    # Extra SQLite databases to shard tasks across, as a JSON list; the
+    # primary database is shard "0" (see app.sharding)
+    shard_urls: List[str] = []
+    # Answer task filters and counts from an in-memory read model; only
+    # for single-process deployments (see app.read_model)
+    read_model_enabled: bool = False
+    # Serve /docs, /redoc and /openapi.json (the schema is built on first use)
+    docs_enabled: bool = True
+
+    # Abort any SQL statement running longer than this many seconds (0 = no
+    # limit); route_query_timeouts overrides it per route path template, as
+    # JSON, e.g. '{"/tasks": 2, "/tasks/{task_id}": 5}'
+    query_timeout_seconds: float = 0
+    route_query_timeouts: Dict[str, float] = {}
+    # Cancel the database work of a GET request whose client disconnects
+    cancel_on_disconnect: bool = True
+
+    # Identical concurrent GETs of these paths share one execution and
+    # response (an empty list disables coalescing; see app.coalescing)
+    coalesce_paths: List[str] = ["/tasks", "/tasks/summary"]
+    # Also replay a shared 200 response for this many seconds after it is
+    # complete; writes through this process drop it early
+    coalesce_cache_seconds: float = 0
+
+    # Done tasks older than this are moved to the archive table
+    archive_after_days: int = 30
+    archive_batch_size: int = 500
+    # 0 disables the background archiver; POST /tasks/archive still works
+    archive_interval_seconds: int = 0
+
+    # Requests sent with "X-Profile: <profile_token>" are profiled
+    profile_token: Optional[str] = None
+    # Also profile 1 in every N requests; 0 disables sampling
+    profile_sample_rate: int = 0
+    profile_dir: str = "./profiles"
+
+
+settings = Settings()
@@ -1,9 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func as sql_func
-from sqlalchemy.orm import selectinload
-from app.models import Task, User, TaskStatus
-from app.schemas import TaskCreate, TaskUpdate, UserCreate, UserUpdate
-from typing import List, Literal, Union
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import (
+    Date, cast, delete, insert, literal_column, select, type_coerce,
+    union_all, update, func as sql_func
+)
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import aliased, selectinload
+from app import read_model
+from app.models import ArchivedTask, Task, User, TaskStatus
+from app.schemas import (
+    TaskBulkUpdate, TaskCreate, TaskUpdate, UserCreate, UserUpdate
+)
+from typing import (
+    AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
+)
 
 
 async def get_user(db: AsyncSession, user_id: int) -> Union[User, None]:
@@ -11,28 +21,112 @@ async def get_user(db: AsyncSession, user_id: int) -> Union[User, None]:
     return result.scalar_one_or_none()
 
 
+async def get_users_by_ids(
+    db: AsyncSession, ids: List[int]
+) -> Dict[int, User]:
+    """Fetch many users with one ``IN`` query, keyed by id."""
+    result = await db.execute(select(User).where(User.id.in_(set(ids))))
+    return {user.id: user for user in result.scalars().all()}
+
+
 async def get_user_by_email(db: AsyncSession, email: str) -> Union[User, None]:
-    result = await db.execute(select(User).where(User.email == email))
+    result = await db.execute(
+        select(User).where(sql_func.lower(User.email) == email.lower())
+    )
     return result.scalar_one_or_none()
 
 
 async def get_users(
     db: AsyncSession,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    after_id: Union[int, None] = None
 ) -> List[User]:
-    result = await db.execute(select(User).offset(skip).limit(limit))
+    result = await db.execute(_users_page(skip, limit, after_id))
     return list(result.scalars().all())
 
 
-async def create_user(db: AsyncSession, user: UserCreate) -> User:
-    db_user = User(**user.model_dump())
-    db.add(db_user)
+async def get_users_with_task_counts(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Union[int, None] = None
+) -> List[Tuple[User, dict]]:
+    """A page of users, each with its live tasks counted by status.
+
+    One statement: a single grouped aggregate over just the page's tasks
+    (served by ``idx_user_status``) is outer-joined to the page of users.
+    Tasks must live in the same database as users, so sharded deployments
+    count per shard instead (see ``ShardRouter.iter_user_summaries``).
+    """
+    page = _users_page(skip, limit, after_id)
+    counts = (
+        select(
+            Task.user_id,
+            *(
+                sql_func.count().filter(Task.status == status)
+                .label(status.value)
+                for status in TaskStatus
+            ),
+        )
+        .where(Task.user_id.in_(page.with_only_columns(User.id)))
+        .group_by(Task.user_id)
+        .subquery()
+    )
+    query = page.add_columns(
+        *(
+            sql_func.coalesce(counts.c[status.value], 0)
+            for status in TaskStatus
+        )
+    ).outerjoin(counts, counts.c.user_id == User.id)
+    result = await db.execute(query)
+    users = []
+    for user, *status_counts in result.all():
+        task_counts = {
+            status.value: count
+            for status, count in zip(TaskStatus, status_counts)
+        }
+        task_counts["total"] = sum(status_counts)
+        users.append((user, task_counts))
+    return users
+
+
+def _users_page(skip: int, limit: int, after_id: Union[int, None]):
+    """Users ordered by id; ``after_id`` seeks past earlier pages by key."""
+    query = select(User).order_by(User.id)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    return query.offset(skip).limit(limit)
+
+
+async def create_user(db: AsyncSession, user: UserCreate) -> Union[User, None]:
+    """Insert ``user`` in one statement; None if the email is taken.
+
+    Uses INSERT ... ON CONFLICT DO NOTHING RETURNING, so concurrent
+    registrations of the same email cannot race into an IntegrityError.
+    """
+    query = (
+        _dialect_insert(db, User)(User)
+        .values(**user.model_dump())
+        .on_conflict_do_nothing()
+        .returning(User)
+    )
+    result = await db.execute(query)
+    db_user = result.scalar_one_or_none()
     await db.commit()
-    await db.refresh(db_user)
     return db_user
 
 
+def _dialect_insert(db: AsyncSession, model):
+    """``insert`` with ON CONFLICT support for ``model``'s dialect."""
+    if db.get_bind(model.__mapper__).dialect.name == "postgresql":
+        # Imported here so SQLite deployments never load the PG dialect
+        from sqlalchemy.dialects import postgresql
+
+        return postgresql.insert
+    return sqlite.insert
+
+
 async def update_user(
     db: AsyncSession, user_id: int, user_update: UserUpdate
 ) -> Union[User, None]:
@@ -56,19 +150,63 @@ async def delete_user(db: AsyncSession, user_id: int) -> bool:
 
     await db.delete(db_user)
     await db.commit()
+    read_model.forget_user(user_id)
     return True
 
 
 async def get_task(
-    db: AsyncSession, task_id: int, include_user: bool = False
-) -> Union[Task, None]:
+    db: AsyncSession,
+    task_id: int,
+    include_user: bool = False,
+    include_archived: bool = False,
+) -> Union[Task, ArchivedTask, None]:
     query = select(Task).where(Task.id == task_id)
     if include_user:
         query = query.options(selectinload(Task.user))
     result = await db.execute(query)
+    task = result.scalar_one_or_none()
+    if task is None and include_archived:
+        task = await get_archived_task(db, task_id, include_user)
+    return task
+
+
+async def get_archived_task(
+    db: AsyncSession, task_id: int, include_user: bool = False
+) -> Union[ArchivedTask, None]:
+    query = select(ArchivedTask).where(ArchivedTask.id == task_id)
+    if include_user:
+        query = query.options(selectinload(ArchivedTask.user))
+    result = await db.execute(query)
     return result.scalar_one_or_none()
 
 
+async def get_tasks_by_ids(
+    db: AsyncSession,
+    ids: List[int],
+    include_user: bool = False,
+    include_archived: bool = False,
+) -> Dict[int, Union[Task, ArchivedTask]]:
+    """Fetch many tasks keyed by id.
+
+    One ``IN`` query (plus one batched user load with ``include_user``);
+    the archive is only queried for ids missing from the live table.
+    """
+    models = [Task, ArchivedTask] if include_archived else [Task]
+    tasks = {}
+    missing = set(ids)
+    for model in models:
+        if not missing:
+            break
+        query = select(model).where(model.id.in_(missing))
+        if include_user:
+            query = query.options(selectinload(model.user))
+        result = await db.execute(query)
+        for task in result.scalars().all():
+            tasks[task.id] = task
+        missing -= tasks.keys()
+    return tasks
+
+
 async def get_tasks(
     db: AsyncSession,
     skip: int = 0,
@@ -77,21 +215,23 @@ async def get_tasks(
     status: Union[TaskStatus, None] = None,
     order_by: Union[Literal["asc", "desc"], None] = None,
     include_user: bool = False,
+    include_archived: bool = False,
 ) -> List[Task]:
-    query = select(Task)
+    entity = _live_and_archived_tasks() if include_archived else Task
+    query = select(entity)
 
     if user_id:
-        query = query.where(Task.user_id == user_id)
+        query = query.where(entity.user_id == user_id)
     if status:
-        query = query.where(Task.status == status)
+        query = query.where(entity.status == status)
 
     if order_by == "asc":
-        query = query.order_by(Task.due_date.asc().nulls_last())
+        query = query.order_by(entity.due_date.asc().nulls_last())
     elif order_by == "desc":
-        query = query.order_by(Task.due_date.desc().nulls_last())
+        query = query.order_by(entity.due_date.desc().nulls_last())
 
     if include_user:
-        query = query.options(selectinload(Task.user))
+        query = query.options(selectinload(entity.user))
 
     query = query.offset(skip).limit(limit)
     result = await db.execute(query)
@@ -117,6 +257,7 @@ async def create_task(
     db.add(db_task)
     await db.commit()
     await db.refresh(db_task)
+    read_model.record(db_task)
     return db_task
 
 
@@ -133,16 +274,66 @@ async def update_task(
 
     await db.commit()
     await db.refresh(db_task)
+    read_model.record(db_task)
     return db_task
 
 
+async def bulk_update_tasks(
+    db: AsyncSession, bulk: TaskBulkUpdate
+) -> Tuple[int, Optional[List[Task]]]:
+    """Apply one set-based UPDATE to every task matching the selection.
+
+    Returns the affected row count and, when ``bulk.return_rows`` is set,
+    the updated tasks (fetched in the same statement via RETURNING).
+    """
+    query = update(Task)
+
+    if bulk.ids is not None:
+        query = query.where(Task.id.in_(bulk.ids))
+    # Match the validator's "is not None" test, so an accepted selector can
+    # never be dropped and widen the UPDATE to every task
+    if bulk.user_id is not None:
+        query = query.where(Task.user_id == bulk.user_id)
+    if bulk.status is not None:
+        query = query.where(Task.status == bulk.status)
+    if bulk.due_from is not None:
+        query = query.where(Task.due_date >= bulk.due_from)
+    if bulk.due_to is not None:
+        query = query.where(Task.due_date <= bulk.due_to)
+
+    query = query.values(**bulk.update.model_dump(exclude_unset=True))
+
+    if bulk.return_rows:
+        result = await db.execute(query.returning(Task))
+        tasks = list(result.scalars().all())
+        await db.commit()
+        for task in tasks:
+            read_model.record(task)
+        return len(tasks), tasks
+
+    if read_model.enabled():
+        result = await db.execute(query.returning(
+            Task.id, Task.user_id, Task.status, Task.due_date
+        ))
+        rows = result.all()
+        await db.commit()
+        for row in rows:
+            read_model.tasks.upsert(*row)
+        return len(rows), None
+
+    result = await db.execute(query)
+    await db.commit()
+    return result.rowcount, None
+
+
 async def delete_task(db: AsyncSession, task_id: int) -> bool:
-    db_task = await get_task(db, task_id)
+    db_task = await get_task(db, task_id, include_archived=True)
     if not db_task:
         return False
 
     await db.delete(db_task)
     await db.commit()
+    read_model.forget([task_id])
     return True
 
 
@@ -151,24 +342,27 @@ async def get_task_by_idempotency_key(
     key: str
 ) -> Union[Task, None]:
     result = await db.execute(select(Task).where(Task.idempotency_key == key))
-    return result.scalar_one_or_none()
+    task = result.scalar_one_or_none()
+    if task is None:
+        # Retries of long-finished tasks must not create duplicates
+        result = await db.execute(
+            select(ArchivedTask).where(ArchivedTask.idempotency_key == key)
+        )
+        task = result.scalars().first()
+    return task
 
 
 async def get_tasks_summary(
     db: AsyncSession,
-    user_id: Union[int, None] = None
+    user_id: Union[int, None] = None,
+    include_archived: bool = False,
 ) -> dict:
     """Get count of tasks per status"""
-    query = select(
-        Task.status,
-        sql_func.count(Task.id).label("count")
-    ).group_by(Task.status)
-
-    if user_id:
-        query = query.where(Task.user_id == user_id)
-
-    result = await db.execute(query)
-    status_counts = {status: count for status, count in result.all()}
+    status_counts = await _count_by_status(db, Task, user_id)
+    if include_archived:
+        archived_counts = await _count_by_status(db, ArchivedTask, user_id)
+        for status, count in archived_counts.items():
+            status_counts[status] = status_counts.get(status, 0) + count
 
     return {
         "pending": status_counts.get(TaskStatus.PENDING, 0),
@@ -177,13 +371,174 @@ async def get_tasks_summary(
         "total": sum(status_counts.values()),
     }
 
+
+async def iter_user_summaries(
+    db: AsyncSession,
+    user_ids: List[int],
+    bucket_by: Union[Literal["due_date", "created_at"], None] = None,
+    bucket: Literal["day", "week"] = "day",
+) -> AsyncIterator[dict]:
+    """Yield per-user (and optionally per-bucket) status counts.
+
+    All users are answered by one grouped query over ``idx_user_status``,
+    streamed from the database and folded into one dict per group. Without
+    bucketing, requested users that have no tasks get an all-zero summary.
+    """
+    group_columns = [Task.user_id]
+    if bucket_by:
+        group_columns.append(
+            _date_bucket(db, getattr(Task, bucket_by), bucket).label("bucket")
+        )
+    query = (
+        select(
+            *group_columns,
+            Task.status,
+            sql_func.count(Task.id).label("count")
+        )
+        .where(Task.user_id.in_(user_ids))
+        .group_by(*group_columns, Task.status)
+        .order_by(*group_columns, Task.status)
+    )
+
+    pending_ids = sorted(set(user_ids), reverse=True)
+    current = None
+    result = await db.stream(query)
+    async for row in result:
+        key = (row.user_id, row.bucket if bucket_by else None)
+        if current is None or (current["user_id"], current["bucket"]) != key:
+            if current is not None:
+                yield current
+            while not bucket_by and pending_ids[-1] < row.user_id:
+                yield _empty_summary(pending_ids.pop())
+            if not bucket_by and pending_ids[-1] == row.user_id:
+                pending_ids.pop()
+            current = _empty_summary(*key)
+        current[row.status.value] += row.count
+        current["total"] += row.count
+    if current is not None:
+        yield current
+    while not bucket_by and pending_ids:
+        yield _empty_summary(pending_ids.pop())
+
+
+def _empty_summary(user_id: int, bucket=None) -> dict:
+    return {
+        "user_id": user_id,
+        "bucket": bucket,
+        "pending": 0,
+        "in_progress": 0,
+        "done": 0,
+        "total": 0,
+    }
+
+
+def _date_bucket(db: AsyncSession, column, bucket: Literal["day", "week"]):
+    """Truncate ``column`` to the start of its day or (Monday-based) week."""
+    if db.get_bind(Task.__mapper__).dialect.name == "postgresql":
+        return cast(sql_func.date_trunc(bucket, column), Date)
+    if bucket == "week":
+        # Inline modifiers, so SQLite sees that GROUP BY and ORDER BY use the
+        # same expression and sorts once
+        return type_coerce(
+            sql_func.date(
+                column,
+                literal_column("'weekday 0'"),
+                literal_column("'-6 days'"),
+            ),
+            Date,
+        )
+    return type_coerce(sql_func.date(column), Date)
+
+
+async def _count_by_status(
+    db: AsyncSession,
+    model: Union[type[Task], type[ArchivedTask]],
+    user_id: Union[int, None] = None
+) -> dict:
+    query = select(
+        model.status,
+        sql_func.count(model.id).label("count")
+    ).group_by(model.status)
+
+    if user_id:
+        query = query.where(model.user_id == user_id)
+
+    result = await db.execute(query)
+    status_counts = {}
+    for status, count in result.all():
+        # A sharded session returns one row per status and shard
+        status_counts[status] = status_counts.get(status, 0) + count
+    return status_counts
+
+
+def _live_and_archived_tasks():
+    """``Task`` entity selecting from live and archived rows together."""
+    columns = [column.name for column in Task.__table__.columns]
+    archived = select(*(ArchivedTask.__table__.c[name] for name in columns))
+    source = union_all(select(Task.__table__), archived).subquery()
+    return aliased(Task, source)
+
+
+async def archive_done_tasks(
+    db: AsyncSession,
+    older_than: timedelta,
+    batch_size: int = 500
+) -> int:
+    """Move tasks done for longer than ``older_than`` to the archive.
+
+    Works in batches of ``batch_size`` rows, committing after each one so
+    writers are never blocked for long. Returns the number of archived tasks.
+    ``db`` must be bound to one database; sharded deployments use
+    ``ShardRouter.archive_done_tasks``.
+    """
+    # Stored timestamps are naive UTC (CURRENT_TIMESTAMP)
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - older_than
+    done_since = sql_func.coalesce(Task.updated_at, Task.created_at)
+    columns = [column.name for column in Task.__table__.columns]
+
+    archived = 0
+    last_id = 0
+    while True:
+        # Resume after the previous batch so the table is walked only once
+        result = await db.execute(
+            select(Task.id)
+            .where(
+                Task.id > last_id,
+                Task.status == TaskStatus.DONE,
+                done_since < cutoff,
+            )
+            .order_by(Task.id)
+            .limit(batch_size)
+        )
+        ids = list(result.scalars().all())
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        await db.execute(
+            insert(ArchivedTask).from_select(
+                columns,
+                select(*(Task.__table__.c[name] for name in columns))
+                .where(Task.id.in_(ids))
+            )
+        )
+        await db.execute(delete(Task).where(Task.id.in_(ids)))
+        await db.commit()
+        read_model.forget(ids)
+
+        archived += len(ids)
+        if len(ids) < batch_size:
+            break
+    return archived
+
+
 async def get_task_type(
     db: AsyncSession,
     user_id: Union[int, None] = None,
     task_type: TaskStatus = TaskStatus.PENDING
 ) -> list:
     query = select(Task).where(Task.status == task_type)
-    
+
     if user_id:
         query = query.where(Task.user_id == user_id)
 
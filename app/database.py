@@ -4,24 +4,41 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine
 )
 
+from app.config import settings
+from app.migrations import upgrade
 from app.models import Base
 
-DATABASE_URL = "sqlite+aiosqlite:///./taskdb.db"
+DATABASE_URL = settings.database_url
 
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True,
-    connect_args={"check_same_thread": False},  # SQLite specific
+    echo=settings.db_echo,
+    connect_args=(
+        {"check_same_thread": False}  # SQLite specific
+        if DATABASE_URL.startswith("sqlite") else {}
+    ),
 )
 
 AsyncSessionLocal = async_sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession
 )
 
+shard_router = None
+if settings.shard_urls:
+    from app.sharding import ShardRouter
+
+    shard_router = ShardRouter(engine, settings.shard_urls)
+    AsyncSessionLocal = shard_router.sessionmaker
+
 
 async def init_db():
+    if shard_router:
+        await shard_router.init()
+        return
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    async with engine.connect() as conn:
+        await conn.run_sync(upgrade)
 
 
 async def get_db():
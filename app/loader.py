@@ -0,0 +1,272 @@
+"""Offline bulk loader for seeding or migrating large user/task datasets.
+
+Rows are read from NDJSON or CSV, validated with the API schemas in a
+process pool and written with chunked ``executemany`` inserts inside large
+transactions. On SQLite the target table's non-unique indexes are dropped
+for the load and rebuilt afterwards. Progress is checkpointed after every
+transaction, so an interrupted load resumes where it stopped::
+
+    python -m app.loader users users.ndjson
+    python -m app.loader tasks tasks.csv --checkpoint tasks.ckpt
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import create_engine, make_url, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from app.config import settings
+from app.models import Base, Task, User
+from app.schemas import TaskCreate, UserCreate
+
+TARGETS = {
+    "users": (UserCreate, User.__table__),
+    "tasks": (TaskCreate, Task.__table__),
+}
+# Columns accepted on top of the schema fields (kept when migrating)
+EXTRA_COLUMNS = {
+    "users": {"id": int},
+    "tasks": {"id": int, "idempotency_key": str},
+}
+DIALECT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """Yield rows from an NDJSON (default) or ``.csv`` file."""
+    with open(path, newline="") as source:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(source):
+                # CSV has no nulls; treat empty cells as missing values
+                yield {key: value or None for key, value in row.items()}
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def validate_chunk(
+    kind: str, start: int, rows: List[dict]
+) -> Tuple[List[Tuple[int, dict]], List[str]]:
+    """Validate ``rows`` (numbered from ``start``) into insertable records.
+
+    Runs in a worker process; returns ``(row number, record)`` pairs and
+    one message per rejected row.
+    """
+    schema, _ = TARGETS[kind]
+    records, errors = [], []
+    for number, row in enumerate(rows, start):
+        try:
+            record = schema.model_validate(row).model_dump()
+            for column, convert in EXTRA_COLUMNS[kind].items():
+                if row.get(column) is not None:
+                    record[column] = convert(row[column])
+        except ValidationError as e:
+            errors.append(f"row {number}: {e.errors()[0]['msg']}")
+            continue
+        except ValueError as e:
+            errors.append(f"row {number}: {e}")
+            continue
+        records.append((number, record))
+    return records, errors
+
+
+def sync_engine(database_url: str) -> Engine:
+    """Blocking engine for the app's (async) database URL."""
+    url = make_url(database_url)
+    return create_engine(url.set(drivername=url.get_backend_name()))
+
+
+def reject_unknown_users(
+    conn, records: List[Tuple[int, dict]]
+) -> Tuple[List[Tuple[int, dict]], List[str]]:
+    """Drop task records whose user does not exist, with one query.
+
+    SQLite does not enforce the foreign key, and such a task would break
+    every response that embeds its user.
+    """
+    user_ids = {record["user_id"] for _, record in records}
+    known = set(conn.execute(
+        select(User.id).where(User.id.in_(user_ids))
+    ).scalars())
+    kept, errors = [], []
+    for number, record in records:
+        if record["user_id"] in known:
+            kept.append((number, record))
+        else:
+            errors.append(f"row {number}: user {record['user_id']} not found")
+    return kept, errors
+
+
+def read_checkpoint(path: Optional[str], source: str) -> int:
+    """Rows of ``source`` already loaded according to checkpoint ``path``."""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as checkpoint:
+        progress = json.load(checkpoint)
+    if progress.get("source") != os.path.abspath(source):
+        raise ValueError(
+            f"Checkpoint {path} belongs to {progress.get('source')}, "
+            f"not {os.path.abspath(source)}"
+        )
+    return progress["rows"]
+
+
+def write_checkpoint(path: Optional[str], source: str, rows: int):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as checkpoint:
+        json.dump(
+            {"source": os.path.abspath(source), "rows": rows}, checkpoint
+        )
+    os.replace(tmp_path, path)
+
+
+def load(
+    kind: str,
+    path: str,
+    database_url: str = settings.database_url,
+    checkpoint: Optional[str] = None,
+    chunk_size: int = 5000,
+    transaction_size: int = 100_000,
+    workers: Optional[int] = None,
+    log=sys.stderr,
+) -> dict:
+    """Load ``path`` into the ``kind`` table; returns load statistics.
+
+    Rows already covered by ``checkpoint`` are skipped; a checkpoint of
+    another source file raises ``ValueError``. Rows conflicting with
+    existing ones (same id, email or idempotency key) are ignored, so rows
+    committed just before a crash are not duplicated on resume as long as
+    they carry one of those keys. Tasks of unknown users are rejected.
+    """
+    done = read_checkpoint(checkpoint, path)
+    _, table = TARGETS[kind]
+    engine = sync_engine(database_url)
+    Base.metadata.create_all(engine)
+    insert = DIALECT_INSERTS[engine.dialect.name]
+    statement = insert(table).on_conflict_do_nothing()
+
+    # Rebuilding once is far cheaper than maintaining indexes per row;
+    # unique indexes stay since they guard against duplicates
+    dropped_indexes = []
+    if engine.dialect.name == "sqlite":
+        dropped_indexes = [
+            index for index in table.indexes if not index.unique
+        ]
+        with engine.begin() as conn:
+            for index in dropped_indexes:
+                conn.execute(DropIndex(index, if_exists=True))
+
+    stats = {"rows": done, "inserted": 0, "rejected": 0}
+    rows = islice(read_rows(path), done, None)
+    started = time.perf_counter()
+
+    def chunks():
+        start = done
+        while chunk := list(islice(rows, chunk_size)):
+            yield start, chunk
+            start += len(chunk)
+
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(workers) as pool, engine.connect() as conn:
+            in_flight = deque()
+            pending = chunks()
+            uncommitted = 0
+            while True:
+                # Keep a bounded number of chunks validating ahead
+                while len(in_flight) < workers * 2:
+                    chunk = next(pending, None)
+                    if chunk is None:
+                        break
+                    future = pool.submit(validate_chunk, kind, *chunk)
+                    in_flight.append((len(chunk[1]), future))
+                if not in_flight:
+                    break
+
+                size, future = in_flight.popleft()
+                records, errors = future.result()
+                if kind == "tasks" and records:
+                    records, orphans = reject_unknown_users(conn, records)
+                    errors += orphans
+                for error in errors:
+                    print(error, file=log)
+                if records:
+                    result = conn.execute(
+                        statement, [record for _, record in records]
+                    )
+                    stats["inserted"] += max(result.rowcount, 0)
+                stats["rejected"] += len(errors)
+                stats["rows"] += size
+                uncommitted += size
+
+                if uncommitted >= transaction_size or not in_flight:
+                    conn.commit()
+                    write_checkpoint(checkpoint, path, stats["rows"])
+                    _report(stats, done, started, log)
+                    uncommitted = 0
+    finally:
+        with engine.begin() as conn:
+            for index in dropped_indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        engine.dispose()
+
+    return stats
+
+
+def _report(stats: dict, resumed_from: int, started: float, log):
+    elapsed = time.perf_counter() - started
+    rate = (stats["rows"] - resumed_from) / elapsed if elapsed else 0
+    print(
+        f"{stats['rows']:,} rows read, {stats['inserted']:,} inserted, "
+        f"{stats['rejected']:,} rejected ({rate:,.0f} rows/s)",
+        file=log,
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=sorted(TARGETS))
+    parser.add_argument("path", help="NDJSON or .csv file")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument(
+        "--checkpoint",
+        help="Progress file used to resume an interrupted load. It is "
+        "written after each commit, so a crash in between replays the last "
+        "transaction: rows with an id, email or idempotency_key are skipped "
+        "as duplicates, while tasks with neither an id nor an "
+        "idempotency_key are inserted again",
+    )
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--transaction-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        load(
+            args.kind,
+            args.path,
+            database_url=args.database_url,
+            checkpoint=args.checkpoint,
+            chunk_size=args.chunk_size,
+            transaction_size=args.transaction_size,
+            workers=args.workers,
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,131 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from datetime import timedelta
 from typing import List, Literal, Optional
 
 from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, schemas
-from app.database import get_db, init_db
+from app import crud, read_model, schemas
+from app.coalescing import CoalescingMiddleware, CoalescingStats
+from app.config import settings
+from app.database import AsyncSessionLocal, get_db, init_db, shard_router
 from app.models import TaskStatus
+from app.timeouts import (
+    QueryTimeoutError, QueryTimeoutMiddleware, query_timeout_handler
+)
+
+logger = logging.getLogger(__name__)
+
+# Multi-user summaries larger than this are streamed as they are read
+SUMMARY_STREAM_THRESHOLD = 100
+
+
+async def archive_periodically():
+    while True:
+        await asyncio.sleep(settings.archive_interval_seconds)
+        older_than = timedelta(days=settings.archive_after_days)
+        try:
+            if shard_router:
+                await shard_router.archive_done_tasks(
+                    older_than, settings.archive_batch_size
+                )
+            else:
+                async with AsyncSessionLocal() as db:
+                    await crud.archive_done_tasks(
+                        db, older_than, settings.archive_batch_size
+                    )
+        except Exception:
+            # Retried next interval; committed batches stay archived
+            logger.exception("Archiving done tasks failed")
+
+
+async def warm_up():
+    """Pay one-time per-process costs before the first user request.
+
+    Compiling each statement shape the first time it runs (and configuring
+    the mappers on the very first one) costs far more than executing it, so
+    run the hot read queries once against an empty result.
+    """
+    async with AsyncSessionLocal() as db:
+        await crud.get_users(db, limit=0)
+        await crud.get_user(db, 0)
+        await crud.get_tasks(db, limit=0)
+        await crud.get_task(db, 0, include_user=True)
+        await crud.get_tasks_summary(db)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await warm_up()
+    if settings.read_model_enabled:
+        tasks = read_model.TaskReadModel()
+        async with AsyncSessionLocal() as db:
+            await tasks.load(db)
+        read_model.tasks = tasks
+    archiver = None
+    if settings.archive_interval_seconds > 0:
+        archiver = asyncio.create_task(archive_periodically())
     yield
+    if archiver:
+        archiver.cancel()
+        with suppress(asyncio.CancelledError):
+            await archiver
+
+
+app = FastAPI(
+    title="Task CRUD API",
+    lifespan=lifespan,
+    docs_url="/docs" if settings.docs_enabled else None,
+    redoc_url="/redoc" if settings.docs_enabled else None,
+    openapi_url="/openapi.json" if settings.docs_enabled else None,
+)
 
+app.add_exception_handler(QueryTimeoutError, query_timeout_handler)
+if (
+    settings.cancel_on_disconnect
+    or settings.query_timeout_seconds
+    or settings.route_query_timeouts
+):
+    app.add_middleware(
+        QueryTimeoutMiddleware,
+        timeout=settings.query_timeout_seconds,
+        route_timeouts=settings.route_query_timeouts,
+        cancel_on_disconnect=settings.cancel_on_disconnect,
+        routes=app.routes,
+    )
 
-app = FastAPI(title="Task CRUD API", lifespan=lifespan)
+coalescing_stats = CoalescingStats()
+if settings.coalesce_paths:
+    # Outside QueryTimeoutMiddleware, so one waiter disconnecting does not
+    # cancel a query the other waiters share
+    app.add_middleware(
+        CoalescingMiddleware,
+        paths=settings.coalesce_paths,
+        cache_seconds=settings.coalesce_cache_seconds,
+        stats=coalescing_stats,
+    )
+
+if settings.profile_token or settings.profile_sample_rate:
+    from app.profiling import ProfiledRoute, ProfilingMiddleware
+
+    app.router.route_class = ProfiledRoute
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=settings.profile_token,
+        sample_rate=settings.profile_sample_rate,
+        output_dir=settings.profile_dir,
+    )
+
+
+@app.get("/metrics/coalescing", response_model=schemas.CoalescingMetrics)
+async def get_coalescing_metrics():
+    """Share of coalesced-path reads answered without their own execution"""
+    return coalescing_stats.as_dict()
 
 
 @app.post("/users", response_model=schemas.UserResponse, status_code=201)
@@ -24,17 +133,77 @@ async def create_user(
     user: schemas.UserCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    existing = await crud.get_user_by_email(db, user.email)
-    if existing:
+    db_user = await crud.create_user(db, user)
+    if db_user is None:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return await crud.create_user(db, user)
+    return db_user
 
 
 @app.get("/users", response_model=List[schemas.UserResponse])
 async def list_users(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = Query(
+        None, description="Only users with a greater id (keyset paging)"
+    ),
+    db: AsyncSession = Depends(get_db),
 ):
-    return await crud.get_users(db, skip=skip, limit=limit)
+    return await crud.get_users(db, skip=skip, limit=limit, after_id=after_id)
+
+
+@app.get(
+    "/users/task-counts", response_model=List[schemas.UserWithTaskCounts]
+)
+async def list_users_with_task_counts(
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = Query(
+        None, description="Only users with a greater id (keyset paging)"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """List users like GET /users, each with task counts by status"""
+    if read_model.enabled() or shard_router:
+        users = await crud.get_users(
+            db, skip=skip, limit=limit, after_id=after_id
+        )
+        if read_model.enabled():
+            counts = {user.id: read_model.tasks.summary(user.id)
+                      for user in users}
+        else:
+            counts = {
+                summary["user_id"]: summary
+                async for summary in shard_router.iter_user_summaries(
+                    [user.id for user in users]
+                )
+            }
+        users = [(user, counts[user.id]) for user in users]
+    else:
+        users = await crud.get_users_with_task_counts(
+            db, skip=skip, limit=limit, after_id=after_id
+        )
+    # Plain dicts: response_model validates each user once
+    fields = schemas.UserResponse.model_fields
+    return [
+        {
+            **{field: getattr(user, field) for field in fields},
+            "task_counts": task_counts,
+        }
+        for user, task_counts in users
+    ]
+
+
+@app.post("/users/lookup", response_model=List[schemas.UserLookupResult])
+async def lookup_users(
+    lookup: schemas.LookupRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get many users by id, in request order, with not-found markers"""
+    users = await crud.get_users_by_ids(db, lookup.ids)
+    return [
+        {"id": user_id, "found": user_id in users, "user": users.get(user_id)}
+        for user_id in lookup.ids
+    ]
 
 
 @app.get("/users/{user_id}", response_model=schemas.UserResponse)
@@ -96,15 +265,37 @@ async def list_tasks(
     order_by: Optional[Literal["asc", "desc"]] = Query(
         None, description="Order by due_date (asc or desc)"
     ),
+    include_archived: bool = Query(
+        False, description="Also return archived tasks"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
+    if read_model.enabled() and not include_archived:
+        ids = read_model.tasks.query(
+            skip=skip,
+            limit=limit,
+            user_id=user_id,
+            status=status,
+            order_by=order_by
+        )
+        tasks = await crud.get_tasks_by_ids(db, ids)
+        return [tasks[task_id] for task_id in ids if task_id in tasks]
+    if shard_router and not user_id:
+        return await shard_router.get_tasks(
+            skip=skip,
+            limit=limit,
+            status=status,
+            order_by=order_by,
+            include_archived=include_archived
+        )
     return await crud.get_tasks(
         db,
         skip=skip,
         limit=limit,
         user_id=user_id,
         status=status,
-        order_by=order_by
+        order_by=order_by,
+        include_archived=include_archived
     )
 
 
@@ -114,20 +305,121 @@ async def get_tasks_summary(
         None,
         description="Filter summary by user ID"
     ),
+    include_archived: bool = Query(
+        False, description="Also count archived tasks"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """Get count of tasks grouped by status"""
-    return await crud.get_tasks_summary(db, user_id=user_id)
+    if read_model.enabled() and not include_archived:
+        return read_model.tasks.summary(user_id)
+    if shard_router and not user_id:
+        return await shard_router.get_tasks_summary(
+            include_archived=include_archived
+        )
+    return await crud.get_tasks_summary(
+        db, user_id=user_id, include_archived=include_archived
+    )
+
+
+@app.get(
+    "/tasks/summary/users", response_model=List[schemas.UserTaskSummary]
+)
+async def get_user_task_summaries(
+    user_ids: List[int] = Query(
+        ..., max_length=1000, description="Users to summarize"
+    ),
+    bucket_by: Optional[Literal["due_date", "created_at"]] = Query(
+        None, description="Also group counts by this date column"
+    ),
+    bucket: Literal["day", "week"] = Query(
+        "day", description="Bucket width when bucket_by is set"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get per-user status counts for many users in one grouped query"""
+    if shard_router:
+        summaries = shard_router.iter_user_summaries(
+            user_ids, bucket_by=bucket_by, bucket=bucket
+        )
+    else:
+        summaries = crud.iter_user_summaries(
+            db, user_ids, bucket_by=bucket_by, bucket=bucket
+        )
+    if len(user_ids) <= SUMMARY_STREAM_THRESHOLD:
+        return [summary async for summary in summaries]
+    return StreamingResponse(
+        _stream_json_array(summaries, schemas.UserTaskSummary),
+        media_type="application/json",
+    )
+
+
+async def _stream_json_array(items, schema):
+    """Encode an async iterator of dicts as a JSON array, item by item."""
+    separator = "["
+    async for item in items:
+        yield separator + schema(**item).model_dump_json()
+        separator = ","
+    yield "[]" if separator == "[" else "]"
+
+
+@app.post("/tasks/lookup", response_model=List[schemas.TaskLookupResult])
+async def lookup_tasks(
+    lookup: schemas.LookupRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get many tasks (with their users) by id, in request order"""
+    tasks = await crud.get_tasks_by_ids(
+        db, lookup.ids, include_user=True, include_archived=True
+    )
+    return [
+        {"id": task_id, "found": task_id in tasks, "task": tasks.get(task_id)}
+        for task_id in lookup.ids
+    ]
+
+
+@app.post("/tasks/archive", response_model=schemas.ArchiveResult)
+async def archive_tasks(
+    older_than_days: Optional[int] = Query(
+        None, ge=0, description="Archive tasks done for longer than this"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Move long-finished tasks out of the live table"""
+    if older_than_days is None:
+        older_than_days = settings.archive_after_days
+    older_than = timedelta(days=older_than_days)
+    if shard_router:
+        archived = await shard_router.archive_done_tasks(
+            older_than, settings.archive_batch_size
+        )
+    else:
+        archived = await crud.archive_done_tasks(
+            db, older_than, settings.archive_batch_size
+        )
+    return {"archived": archived}
 
 
 @app.get("/tasks/{task_id}", response_model=schemas.TaskWithUser)
 async def get_task(task_id: int, db: AsyncSession = Depends(get_db)):
-    task = await crud.get_task(db, task_id, include_user=True)
+    task = await crud.get_task(
+        db, task_id, include_user=True, include_archived=True
+    )
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
 
+@app.patch("/tasks/bulk", response_model=schemas.TaskBulkUpdateResult)
+async def bulk_update_tasks(
+    bulk: schemas.TaskBulkUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Update every task selected by ids and/or filters in one statement"""
+    updated, tasks = await crud.bulk_update_tasks(db, bulk)
+    return {"updated": updated, "tasks": tasks}
+
+
 @app.patch("/tasks/{task_id}", response_model=schemas.TaskResponse)
 async def update_task(
     task_id: int,
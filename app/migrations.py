@@ -0,0 +1,205 @@
+"""In-place upgrades for databases created by earlier versions.
+
+``create_all`` only creates missing tables; it never alters an existing
+one. ``upgrade`` brings such tables in line with the current models. Every
+step checks first and does nothing on an up-to-date database, so it runs on
+every startup, right after ``create_all``.
+"""
+from contextlib import contextmanager
+from typing import Optional, Set
+
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+
+from app.models import Base, Task, User
+
+# The old tasks table is renamed to this while it is rebuilt
+REBUILT_TASKS_TABLE = "tasks_pre_autoincrement"
+# Built over normalized emails; once it exists they need no more checking
+EMAIL_INDEX = "uq_users_email_lower"
+
+
+def upgrade(
+    conn: Connection,
+    task_id_floor: int = 0,
+    task_id_ceiling: Optional[int] = None,
+):
+    """Run every pending upgrade step, each in a transaction of its own.
+
+    ``conn`` must not be in a transaction yet (``engine.connect()``). New
+    task ids are allocated from the range given by ``task_id_floor`` and
+    ``task_id_ceiling`` (see ``raise_task_sequence``).
+    """
+    if conn.dialect.name == "sqlite":
+        with _transaction(conn):
+            _rebuild_tasks_with_autoincrement(conn)
+            raise_task_sequence(conn, task_id_floor, task_id_ceiling)
+            _renumber_shadowed_archived_tasks(conn)
+    with _transaction(conn):
+        indexes = _index_names(conn)
+        if EMAIL_INDEX not in indexes:
+            _normalize_emails(conn)
+        _create_missing_indexes(conn, indexes)
+
+
+class MigrationError(Exception):
+    """Existing data has to be fixed by hand before the upgrade can run."""
+
+
+@contextmanager
+def _transaction(conn: Connection):
+    """A transaction that also covers DDL.
+
+    pysqlite only opens a transaction before DML, so on SQLite one is begun
+    explicitly; a failed step then leaves no half-rebuilt table behind.
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _rebuild_tasks_with_autoincrement(conn: Connection):
+    """Recreate a ``tasks`` table created without AUTOINCREMENT.
+
+    Without it SQLite reuses the id of the newest task once it is deleted
+    or archived, and a new task would then shadow the archived one.
+    """
+    table_sql = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+    ).scalar()
+    if table_sql is None or "AUTOINCREMENT" in table_sql.upper():
+        return
+
+    existing = {
+        row.name for row in conn.exec_driver_sql("PRAGMA table_info(tasks)")
+    }
+    columns = ", ".join(
+        column.name for column in Task.__table__.columns
+        if column.name in existing
+    )
+    conn.exec_driver_sql(f"ALTER TABLE tasks RENAME TO {REBUILT_TASKS_TABLE}")
+    # Indexes follow the renamed table; free their names for the new one
+    for index in conn.exec_driver_sql(
+        f"PRAGMA index_list({REBUILT_TASKS_TABLE})"
+    ).all():
+        if index.origin == "c":
+            conn.exec_driver_sql(f'DROP INDEX "{index.name}"')
+    Task.__table__.create(conn)
+    conn.exec_driver_sql(
+        f"INSERT INTO tasks ({columns}) "
+        f"SELECT {columns} FROM {REBUILT_TASKS_TABLE}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {REBUILT_TASKS_TABLE}")
+
+
+def raise_task_sequence(
+    conn: Connection, floor: int = 0, ceiling: Optional[int] = None
+):
+    """Make SQLite allocate new task ids above ``floor`` and above every
+    live or archived task id, so no id is ever handed out twice.
+
+    Ids from ``ceiling`` up are ignored; a shard may hold tasks whose ids
+    were allocated by a higher shard.
+    """
+    params = {"floor": floor, "ceiling": ceiling}
+    below = "" if ceiling is None else " WHERE id < :ceiling"
+    high = (
+        "max(:floor, "
+        f"(SELECT coalesce(max(id), 0) FROM tasks{below}), "
+        f"(SELECT coalesce(max(id), 0) FROM tasks_archive{below}))"
+    )
+    result = conn.execute(
+        text(
+            f"UPDATE sqlite_sequence SET seq = max(seq, {high}) "
+            "WHERE name = 'tasks'"
+        ),
+        params,
+    )
+    if not result.rowcount:
+        conn.execute(
+            text(
+                "INSERT INTO sqlite_sequence (name, seq) "
+                f"SELECT 'tasks', {high}"
+            ),
+            params,
+        )
+
+
+def _renumber_shadowed_archived_tasks(conn: Connection):
+    """Give new ids to archived tasks whose id a live task has reused.
+
+    Only databases that reused ids before the rebuild have any. Lookups by
+    id already return the live task, so the archived copy is the one that
+    moves; otherwise the next archive pass fails on the duplicate id.
+    """
+    shadowed = conn.exec_driver_sql(
+        "SELECT id FROM tasks_archive WHERE id IN (SELECT id FROM tasks) "
+        "ORDER BY id"
+    ).scalars().all()
+    if not shadowed:
+        return
+    last = conn.exec_driver_sql(
+        "UPDATE sqlite_sequence SET seq = seq + ? WHERE name = 'tasks' "
+        "RETURNING seq",
+        (len(shadowed),),
+    ).scalar_one()
+    for new_id, old_id in enumerate(shadowed, last - len(shadowed) + 1):
+        conn.exec_driver_sql(
+            "UPDATE tasks_archive SET id = ? WHERE id = ?", (new_id, old_id)
+        )
+
+
+def _normalize_emails(conn: Connection):
+    """Store every email the way the API does (trimmed, lower case), so
+    the unique index on ``lower(email)`` can be built."""
+    if not inspect(conn).has_table(User.__tablename__):
+        return
+    normalized = func.lower(func.trim(User.email))
+    duplicates = conn.execute(
+        select(normalized)
+        .group_by(normalized)
+        .having(func.count() > 1)
+        .limit(10)
+    ).scalars().all()
+    if duplicates:
+        raise MigrationError(
+            "Users share an email up to case; merge or rename them first: "
+            + ", ".join(duplicates)
+        )
+    conn.execute(
+        update(User).where(User.email != normalized).values(email=normalized)
+    )
+
+
+def _index_names(conn: Connection) -> Set[str]:
+    """Names of the indexes already in the database.
+
+    Read from ``sqlite_master`` on SQLite, whose reflection leaves out
+    expression indexes such as the one on ``lower(email)``.
+    """
+    if conn.dialect.name == "sqlite":
+        return set(conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        ).scalars())
+    inspector = inspect(conn)
+    return {
+        index["name"]
+        for table in inspector.get_table_names()
+        for index in inspector.get_indexes(table)
+    }
+
+
+def _create_missing_indexes(conn: Connection, existing: Set[str]):
+    """Create indexes added to the models after their table was created."""
+    tables = set(inspect(conn).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name in tables:
+            for index in table.indexes:
+                if index.name not in existing:
+                    conn.execute(CreateIndex(index))
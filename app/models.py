@@ -27,7 +27,7 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    email = Column(String, unique=True, nullable=False, index=True)
+    email = Column(String, nullable=False)
     phone_number = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -36,6 +36,16 @@ class User(Base):
         back_populates="user",
         cascade="all, delete-orphan"
     )
+    archived_tasks = relationship(
+        "ArchivedTask",
+        back_populates="user",
+        cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        # Case-insensitive uniqueness; lookups probe lower(email)
+        Index("uq_users_email_lower", func.lower(email), unique=True),
+    )
 
 
 class Task(Base):
@@ -58,5 +68,53 @@ class Task(Base):
 
     __table_args__ = (
         Index("idx_user_status", "user_id", "status"),
+        # A user's tasks in due-date order, without a sort
+        Index("idx_user_due_date", "user_id", "due_date"),
         Index("idx_due_date", "due_date"),
+        # Never reuse ids, so archived tasks keep a unique id
+        {"sqlite_autoincrement": True},
     )
+
+
+class ArchivedTask(Base):
+    """Cold copy of a task that has been done for longer than the archive age.
+
+    Rows keep their original ``id`` so lookups can fall back here.
+    """
+    __tablename__ = "tasks_archive"
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    status = Column(Enum(TaskStatus), nullable=False)
+    due_date = Column(Date, nullable=True)
+    idempotency_key = Column(String, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User", back_populates="archived_tasks")
+
+    __table_args__ = (
+        Index("idx_archive_user_status", "user_id", "status"),
+        Index("idx_archive_user_due_date", "user_id", "due_date"),
+        Index("idx_archive_due_date", "due_date"),
+        Index("idx_archive_idempotency_key", "idempotency_key"),
+    )
+
+
+class UserShard(Base):
+    """Directory entry pinning a user's tasks to a shard (see sharding)."""
+    __tablename__ = "user_shards"
+
+    user_id = Column(Integer, primary_key=True)
+    shard_id = Column(String, nullable=False)
+
+
+class TaskShard(Base):
+    """Directory entry for a task kept on a shard other than the one its id
+    was allocated on, after its user was moved (see sharding)."""
+    __tablename__ = "task_shards"
+
+    task_id = Column(Integer, primary_key=True)
+    shard_id = Column(String, nullable=False)
@@ -0,0 +1,209 @@
+"""Opt-in per-request profiling.
+
+``ProfilingMiddleware`` profiles a request when it carries the configured
+``X-Profile`` token, or for 1 in every ``sample_rate`` requests. A profiled
+request gets:
+
+* a sampled stack profile of the event-loop thread, written to
+  ``output_dir`` in the collapsed-stack format read by ``flamegraph.pl``
+  and speedscope;
+* a ``Server-Timing`` header splitting the time spent in the database,
+  the endpoint itself, response-model validation and JSON serialization.
+
+The stage split needs the routes to use ``ProfiledRoute``. The sampler sees
+the whole event loop, so requests running concurrently show up in the same
+profile.
+"""
+import functools
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from inspect import iscoroutinefunction
+from typing import Optional
+
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestTimings:
+    """Seconds spent in each stage of one profiled request."""
+
+    def __init__(self):
+        self.db = 0.0
+        self.endpoint = 0.0
+        self.endpoint_end = None
+        self.render_start = None
+        self.render = 0.0
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, params, context, many):
+    if current_timings.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, params, context, many):
+    timings = current_timings.get()
+    if timings is not None and conn.info.get("query_start"):
+        timings.db += time.perf_counter() - conn.info["query_start"].pop()
+
+
+class TimedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        timings = current_timings.get()
+        if timings is None:
+            return super().render(content)
+        timings.render_start = time.perf_counter()
+        body = super().render(content)
+        timings.render = time.perf_counter() - timings.render_start
+        return body
+
+
+class ProfiledRoute(APIRoute):
+    """Route that reports endpoint and JSON rendering time to the profiler."""
+
+    def get_route_handler(self):
+        if (
+            isinstance(self.response_class, DefaultPlaceholder)
+            and self.response_class.value is JSONResponse
+        ):
+            self.response_class = Default(TimedJSONResponse)
+
+        endpoint = self.dependant.call
+        if iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args, **kwargs):
+                timings = current_timings.get()
+                if timings is None:
+                    return await endpoint(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    timings.endpoint_end = time.perf_counter()
+                    timings.endpoint += timings.endpoint_end - start
+
+            self.dependant.call = timed_endpoint
+        return super().get_route_handler()
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                location = f"{code.co_filename}:{code.co_firstlineno}"
+                stack.append(f"{code.co_name} ({location})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: str):
+        with open(path, "w") as output:
+            for stack, count in self.stacks.items():
+                output.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app,
+        token: Optional[str] = None,
+        sample_rate: int = 0,
+        output_dir: str = "./profiles",
+        interval: float = 0.001,
+    ):
+        self.app = app
+        self.token = token
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.interval = interval
+        self._requests = itertools.count(1)
+
+    def should_profile(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    # Bytes on both sides: str operands must be ASCII
+                    return hmac.compare_digest(value, self.token.encode())
+        return bool(self.sample_rate) and (
+            next(self._requests) % self.sample_rate == 0
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        reset_token = current_timings.set(timings)
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        profile_name = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}"
+            f"{scope['path'].replace('/', '_')}-{id(timings):x}.folded"
+        )
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = server_timing(timings, time.perf_counter() - started)
+                header += f', profile;desc="{profile_name}"'
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            sampler.stop()
+            current_timings.reset(reset_token)
+            os.makedirs(self.output_dir, exist_ok=True)
+            sampler.write(os.path.join(self.output_dir, profile_name))
+
+
+def server_timing(timings: RequestTimings, total: float) -> str:
+    """Format ``timings`` as a ``Server-Timing`` header value (ms)."""
+    metrics = {"db": timings.db}
+    if timings.endpoint_end is not None:
+        metrics["app"] = max(timings.endpoint - timings.db, 0.0)
+        if timings.render_start is not None:
+            metrics["validation"] = timings.render_start - timings.endpoint_end
+            metrics["serialization"] = timings.render
+    metrics["total"] = total
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.3f}" for name, seconds in metrics.items()
+    )
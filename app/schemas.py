@@ -1,16 +1,27 @@
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import (
+    BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator
+)
 
 from app.models import TaskStatus
 
+# Upper bound on ids resolved (or bulk-updated) by one request
+MAX_LOOKUP_IDS = 500
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    return email.strip().lower() if email else email
+
 
 class UserBase(BaseModel):
     name: str
     email: EmailStr
     phone_number: Optional[str] = None
 
+    _normalize_email = field_validator("email")(normalize_email)
+
 
 class UserCreate(UserBase):
     pass
@@ -21,6 +32,8 @@ class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     phone_number: Optional[str] = None
 
+    _normalize_email = field_validator("email")(normalize_email)
+
 
 class UserResponse(UserBase):
     id: int
@@ -43,6 +56,36 @@ class TaskUpdate(BaseModel):
     status: Optional[TaskStatus] = None
     due_date: Optional[date] = None
 
+    @field_validator("title", "status")
+    @classmethod
+    def reject_null(cls, value):
+        # Omit a field to leave it unchanged; the columns are NOT NULL
+        if value is None:
+            raise ValueError("May be omitted but not null")
+        return value
+
+
+class TaskBulkUpdate(BaseModel):
+    """Select tasks by ``ids`` and/or filters and apply ``update`` to all."""
+    ids: Optional[List[int]] = Field(None, max_length=MAX_LOOKUP_IDS)
+    user_id: Optional[int] = None
+    status: Optional[TaskStatus] = None
+    due_from: Optional[date] = None
+    due_to: Optional[date] = None
+    update: TaskUpdate
+    return_rows: bool = False
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        selectors = (
+            self.ids, self.user_id, self.status, self.due_from, self.due_to
+        )
+        if all(selector is None for selector in selectors):
+            raise ValueError("Provide ids or at least one filter")
+        if not self.update.model_fields_set:
+            raise ValueError("Update payload is empty")
+        return self
+
 
 class TaskResponse(TaskBase):
     id: int
@@ -63,3 +106,45 @@ class TaskSummary(BaseModel):
     in_progress: int
     done: int
     total: int
+
+
+class ArchiveResult(BaseModel):
+    archived: int
+
+
+class TaskBulkUpdateResult(BaseModel):
+    updated: int
+    tasks: Optional[List[TaskResponse]] = None
+
+
+class UserWithTaskCounts(UserResponse):
+    task_counts: TaskSummary
+
+
+class UserTaskSummary(TaskSummary):
+    user_id: int
+    bucket: Optional[date] = None
+
+
+class LookupRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_LOOKUP_IDS)
+
+
+class UserLookupResult(BaseModel):
+    id: int
+    found: bool
+    user: Optional[UserResponse] = None
+
+
+class TaskLookupResult(BaseModel):
+    id: int
+    found: bool
+    task: Optional[TaskWithUser] = None
+
+
+class CoalescingMetrics(BaseModel):
+    requests: int
+    executed: int
+    joined: int
+    cached: int
+    coalescing_ratio: float
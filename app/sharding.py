@@ -0,0 +1,454 @@
+"""Horizontal sharding of tasks by ``user_id`` across SQLite databases.
+
+Shard ``"0"`` is the primary database (``DATABASE_URL``). It holds users,
+the ``user_shards`` directory and its own share of tasks. Shards ``"1"``,
+``"2"``, ... come from ``SHARD_URLS`` and hold only tasks and archived tasks.
+
+* A user's tasks live on exactly one shard. That shard comes from a
+  consistent-hash ring over the shard ids, unless the directory pins the
+  user elsewhere. At startup, users whose tasks already sit on a different
+  shard (pre-sharding data, a newly added shard) are pinned where their
+  data is. ``move_user`` relocates them.
+* Shard ``k`` allocates task ids from ``k << TASK_ID_SHARD_SHIFT``, so a
+  task's shard follows from its id. Moved tasks keep their ids; the
+  ``task_shards`` directory records where they went.
+* ``ShardRouter.sessionmaker`` builds sessions that route every statement
+  to the shards it can touch, by looking at its ``user_id`` and ``id``
+  criteria. Single-user and by-id operations therefore hit one shard.
+* Cross-user reads that need merging run on every shard concurrently
+  (``scatter``) and merge in Python.
+
+The directories are cached per process; restart the app after ``move_user``::
+
+    python -m app.sharding where 42
+    python -m app.sharding move-user 42 1
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Literal, Optional, Union
+
+from sqlalchemy import delete, event, insert, select, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from app import crud
+from app.migrations import upgrade
+from app.models import (
+    ArchivedTask,
+    Base,
+    Task,
+    TaskShard,
+    TaskStatus,
+    UserShard,
+)
+
+PRIMARY = "0"
+# Shard k allocates task ids in [k << 40, (k + 1) << 40)
+TASK_ID_SHARD_SHIFT = 40
+RING_REPLICAS = 64
+
+TASK_TABLES = (Task.__table__, ArchivedTask.__table__)
+
+
+def _ring_hash(key: str) -> int:
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class RoutedSession(ShardedSession):
+    """``ShardedSession`` that numbers new tasks itself (see below)."""
+
+
+@event.listens_for(RoutedSession, "before_flush")
+def _assign_task_ids(session, flush_context, instances):
+    """Take new task ids from their shard's sequence.
+
+    SQLite would pick one above the table's highest id, and a shard may
+    hold tasks moved over from a higher shard's range.
+    """
+    new_tasks: Dict[str, List[Task]] = {}
+    for instance in session.new:
+        if isinstance(instance, Task) and instance.id is None:
+            shard_id = session.shard_chooser(Task.__mapper__, instance)
+            new_tasks.setdefault(shard_id, []).append(instance)
+    for shard_id, tasks in new_tasks.items():
+        conn = session.connection(bind_arguments={"shard_id": shard_id})
+        for task, task_id in zip(tasks, _reserve_task_ids(conn, len(tasks))):
+            task.id = task_id
+
+
+class ShardRouter:
+    def __init__(self, primary: AsyncEngine, shard_urls: List[str]):
+        self.engines: Dict[str, AsyncEngine] = {PRIMARY: primary}
+        for number, url in enumerate(shard_urls, 1):
+            self.engines[str(number)] = create_async_engine(url)
+        self.shard_ids = list(self.engines)
+
+        ring = sorted(
+            (_ring_hash(f"{shard_id}:{replica}"), shard_id)
+            for shard_id in self.shard_ids
+            for replica in range(RING_REPLICAS)
+        )
+        self._ring_keys = [key for key, _ in ring]
+        self._ring_shards = [shard_id for _, shard_id in ring]
+        self.directory: Dict[int, str] = {}
+        self.task_directory: Dict[int, str] = {}
+
+        self.sessionmaker = async_sessionmaker(
+            sync_session_class=RoutedSession,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            shards={
+                shard_id: engine.sync_engine
+                for shard_id, engine in self.engines.items()
+            },
+            shard_chooser=self._shard_chooser,
+            identity_chooser=self._identity_chooser,
+            execute_chooser=self._execute_chooser,
+        )
+        # Plain per-shard sessions, for scatter-gather
+        self.shard_sessions = {
+            shard_id: async_sessionmaker(
+                engine, expire_on_commit=False, class_=AsyncSession
+            )
+            for shard_id, engine in self.engines.items()
+        }
+
+    def ring_shard(self, user_id: int) -> str:
+        position = bisect.bisect(self._ring_keys, _ring_hash(str(user_id)))
+        return self._ring_shards[position % len(self._ring_shards)]
+
+    def shard_for_user(self, user_id: int) -> str:
+        return self.directory.get(user_id) or self.ring_shard(user_id)
+
+    def shard_for_task(self, task_id: int) -> str:
+        return self.task_directory.get(task_id) or str(
+            task_id >> TASK_ID_SHARD_SHIFT
+        )
+
+    async def init(self):
+        """Create the schema on every shard and load the directory."""
+        async with self.engines[PRIMARY].begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        for shard_id, engine in self.engines.items():
+            if shard_id != PRIMARY:
+                async with engine.begin() as conn:
+                    await conn.run_sync(
+                        Base.metadata.create_all, tables=list(TASK_TABLES)
+                    )
+            # Tables created by older versions get AUTOINCREMENT, and with
+            # it the sequence the shard's id range is set on
+            async with engine.connect() as conn:
+                await conn.run_sync(
+                    upgrade,
+                    int(shard_id) << TASK_ID_SHARD_SHIFT,
+                    (int(shard_id) + 1) << TASK_ID_SHARD_SHIFT,
+                )
+
+        async with self.shard_sessions[PRIMARY]() as db:
+            result = await db.execute(select(UserShard))
+            self.directory = {
+                entry.user_id: entry.shard_id for entry in result.scalars()
+            }
+            result = await db.execute(select(TaskShard))
+            self.task_directory = {
+                entry.task_id: entry.shard_id for entry in result.scalars()
+            }
+        await self._adopt_misplaced_users()
+
+    async def _adopt_misplaced_users(self):
+        """Pin users whose tasks sit on a shard the ring doesn't point to."""
+        user_ids = await self.scatter(_task_owner_ids)
+        pins = {
+            user_id: shard_id
+            for shard_id, owners in zip(self.shard_ids, user_ids)
+            for user_id in owners
+            if self.shard_for_user(user_id) != shard_id
+        }
+        if pins:
+            async with self.shard_sessions[PRIMARY]() as db:
+                for user_id, shard_id in pins.items():
+                    await db.merge(
+                        UserShard(user_id=user_id, shard_id=shard_id)
+                    )
+                await db.commit()
+            self.directory.update(pins)
+
+    async def scatter(
+        self,
+        fn: Callable[[AsyncSession], Awaitable],
+        shard_ids: Optional[List[str]] = None,
+    ) -> list:
+        """Run ``fn`` on every shard concurrently; results in shard order."""
+        async def run(shard_id):
+            async with self.shard_sessions[shard_id]() as db:
+                return await fn(db)
+
+        return await asyncio.gather(
+            *(run(shard_id) for shard_id in shard_ids or self.shard_ids)
+        )
+
+    async def get_tasks(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        status: Union[TaskStatus, None] = None,
+        order_by: Union[Literal["asc", "desc"], None] = None,
+        include_archived: bool = False,
+    ) -> List[Task]:
+        """Cross-user ``crud.get_tasks``: top ``skip + limit`` per shard,
+        merged in the requested order."""
+        per_shard = await self.scatter(
+            lambda db: crud.get_tasks(
+                db,
+                limit=skip + limit,
+                status=status,
+                order_by=order_by,
+                include_archived=include_archived,
+            )
+        )
+        tasks = [task for shard_tasks in per_shard for task in shard_tasks]
+        tasks.sort(key=lambda task: task.id)
+        if order_by:
+            dated = [task for task in tasks if task.due_date is not None]
+            dated.sort(
+                key=lambda task: task.due_date, reverse=order_by == "desc"
+            )
+            tasks = dated + [task for task in tasks if task.due_date is None]
+        return tasks[skip:skip + limit]
+
+    async def get_tasks_summary(self, include_archived: bool = False) -> dict:
+        """Cross-user ``crud.get_tasks_summary``, summed over shards."""
+        summaries = await self.scatter(
+            lambda db: crud.get_tasks_summary(
+                db, include_archived=include_archived
+            )
+        )
+        return {
+            key: sum(summary[key] for summary in summaries)
+            for key in summaries[0]
+        }
+
+    async def archive_done_tasks(
+        self, older_than: timedelta, batch_size: int = 500
+    ) -> int:
+        """``crud.archive_done_tasks`` on every shard, summed.
+
+        Each shard runs its own pass: the pass resumes after the highest
+        id of its previous batch, which is only meaningful within one
+        shard's id range.
+        """
+        archived = await self.scatter(
+            lambda db: crud.archive_done_tasks(db, older_than, batch_size)
+        )
+        return sum(archived)
+
+    async def iter_user_summaries(self, user_ids: List[int], **options):
+        """``crud.iter_user_summaries``, one shard at a time."""
+        by_shard: Dict[str, List[int]] = {}
+        for user_id in user_ids:
+            by_shard.setdefault(self.shard_for_user(user_id), []).append(
+                user_id
+            )
+        for shard_id, shard_user_ids in by_shard.items():
+            async with self.shard_sessions[shard_id]() as db:
+                summaries = crud.iter_user_summaries(
+                    db, shard_user_ids, **options
+                )
+                async for summary in summaries:
+                    yield summary
+
+    async def move_user(self, user_id: int, target: str) -> int:
+        """Move a user's tasks to shard ``target``; returns how many moved.
+
+        Tasks keep their ids; those allocated on another shard than
+        ``target`` are entered in the ``task_shards`` directory. Copies
+        are committed before the directories are switched and the source
+        is cleaned up, so an interrupted move can simply be re-run. Pause
+        the user's writes while moving.
+        """
+        source = self.shard_for_user(user_id)
+        if source == target:
+            return 0
+
+        rows = {}
+        async with self.shard_sessions[source]() as db:
+            for table in TASK_TABLES:
+                result = await db.execute(
+                    select(table).where(table.c.user_id == user_id)
+                )
+                rows[table] = [dict(row._mapping) for row in result]
+
+        async with self.engines[target].begin() as conn:
+            for table in TASK_TABLES:
+                # Leftovers of an interrupted move are unreachable; replace
+                await conn.execute(
+                    delete(table).where(table.c.user_id == user_id)
+                )
+            sequence = await conn.execute(
+                text("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+            )
+            seq = sequence.scalar_one()
+            for table, table_rows in rows.items():
+                if table_rows:
+                    await conn.execute(insert(table), table_rows)
+            # Inserting ids from a higher range raises the sequence too
+            await conn.execute(
+                text(
+                    "UPDATE sqlite_sequence SET seq = :seq "
+                    "WHERE name = 'tasks'"
+                ),
+                {"seq": seq},
+            )
+
+        task_ids = [
+            row["id"] for table_rows in rows.values() for row in table_rows
+        ]
+        relocated = {
+            task_id: target
+            for task_id in task_ids
+            if task_id >> TASK_ID_SHARD_SHIFT != int(target)
+        }
+        async with self.shard_sessions[PRIMARY]() as db:
+            await db.merge(UserShard(user_id=user_id, shard_id=target))
+            await db.execute(
+                delete(TaskShard).where(TaskShard.task_id.in_(task_ids))
+            )
+            db.add_all(
+                TaskShard(task_id=task_id, shard_id=shard_id)
+                for task_id, shard_id in relocated.items()
+            )
+            await db.commit()
+        self.directory[user_id] = target
+        for task_id in task_ids:
+            self.task_directory.pop(task_id, None)
+        self.task_directory.update(relocated)
+
+        async with self.engines[source].begin() as conn:
+            for table in TASK_TABLES:
+                await conn.execute(
+                    delete(table).where(table.c.user_id == user_id)
+                )
+        return len(task_ids)
+
+    def _shard_chooser(self, mapper, instance, clause=None):
+        if isinstance(instance, (Task, ArchivedTask)):
+            return self.shard_for_user(instance.user_id)
+        return PRIMARY
+
+    def _identity_chooser(self, mapper, primary_key, **kw):
+        if mapper.class_ in (Task, ArchivedTask):
+            return [self.shard_for_task(primary_key[0])]
+        return [PRIMARY]
+
+    def _execute_chooser(self, context):
+        classes = {mapper.class_ for mapper in context.all_mappers}
+        if classes and not classes & {Task, ArchivedTask}:
+            return [PRIMARY]
+
+        shards = None
+        for column, values in _task_criteria(context):
+            if column == "user_id":
+                matched = {self.shard_for_user(value) for value in values}
+            else:
+                matched = {self.shard_for_task(value) for value in values}
+            shards = matched if shards is None else shards & matched
+        if shards is None:
+            return self.shard_ids
+        return [shard_id for shard_id in self.shard_ids if shard_id in shards]
+
+
+def _task_criteria(context):
+    """Yield ``(column, values)`` for each top-level ``user_id``/``id``
+    equality or IN criterion on a task table in the executed statement."""
+    where = getattr(context.statement, "whereclause", None)
+    if where is None:
+        return
+    conjuncts = (
+        where.clauses if getattr(where, "operator", None) is operators.and_
+        else [where]
+    )
+    for criterion in conjuncts:
+        if not isinstance(criterion, BinaryExpression):
+            continue
+        if criterion.operator not in (operators.eq, operators.in_op):
+            continue
+        column, bind = criterion.left, criterion.right
+        if isinstance(column, BindParameter):
+            column, bind = bind, column
+        if not isinstance(bind, BindParameter):
+            continue
+        name = getattr(column, "key", None)
+        if name not in ("user_id", "id") or not any(
+            column.shares_lineage(table.c[name]) for table in TASK_TABLES
+        ):
+            continue
+        value = bind.effective_value
+        if value is None and isinstance(context.parameters, dict):
+            # Lazy loaders pass the parent's key as an execution parameter
+            value = context.parameters.get(bind.key)
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        yield name, values
+
+
+async def _task_owner_ids(db: AsyncSession) -> List[int]:
+    result = await db.execute(select(Task.user_id).distinct())
+    return list(result.scalars())
+
+
+def _reserve_task_ids(conn, count: int) -> range:
+    last = conn.execute(
+        text(
+            "UPDATE sqlite_sequence SET seq = seq + :count "
+            "WHERE name = 'tasks' RETURNING seq"
+        ),
+        {"count": count},
+    ).scalar_one()
+    return range(last - count + 1, last + 1)
+
+
+async def _run_command(args):
+    from app.database import init_db, shard_router as router
+
+    if router is None:
+        raise SystemExit("SHARD_URLS is not configured")
+    await init_db()
+    if args.command == "where":
+        print(router.shard_for_user(args.user_id))
+    else:
+        async with router.shard_sessions[PRIMARY]() as db:
+            if await crud.get_user(db, args.user_id) is None:
+                raise SystemExit(f"User {args.user_id} not found")
+        if args.shard_id not in router.engines:
+            raise SystemExit(f"Unknown shard {args.shard_id}")
+        moved = await router.move_user(args.user_id, args.shard_id)
+        print(f"Moved {moved} tasks to shard {args.shard_id}")
+    for engine in router.engines.values():
+        await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Task shard maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    where = commands.add_parser("where", help="Show a user's shard")
+    where.add_argument("user_id", type=int)
+    move = commands.add_parser("move-user", help="Move a user's tasks")
+    move.add_argument("user_id", type=int)
+    move.add_argument("shard_id")
+    asyncio.run(_run_command(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Statement timeouts and client-disconnect cancellation.
+
+``QueryTimeoutMiddleware`` gives every HTTP request a ``QueryGuard``. SQL
+statements run on behalf of the request are then bounded:
+
+* on SQLite, a progress handler on the connection aborts a statement that
+  has run for longer than the guard's timeout, or whose request has been
+  abandoned;
+* on PostgreSQL, ``statement_timeout`` is set for the transaction, and
+  asyncpg itself cancels the server-side query when its task is cancelled.
+
+A statement that times out raises ``QueryTimeoutError`` (504 through
+``query_timeout_handler``). When the client of a GET request disconnects
+before its response is complete, the request's task is cancelled; the
+connection in use is invalidated and its pool slot released at once.
+"""
+import asyncio
+import time
+from contextlib import suppress
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from starlette.routing import BaseRoute, Match
+from sqlalchemy.engine import Engine
+
+# SQLite VM instructions between two progress-handler checks
+PROGRESS_INTERVAL = 1000
+# Requests without a body to read, whose work is safe to abandon
+CANCELLABLE_METHODS = ("GET", "HEAD")
+
+
+class QueryTimeoutError(Exception):
+    def __init__(self, timeout: float):
+        super().__init__(f"Query exceeded {timeout:g}s")
+        self.timeout = timeout
+
+
+class QueryGuard:
+    """Limits on the SQL statements run for one request."""
+
+    def __init__(self, timeout: float = 0):
+        self.timeout = timeout
+        self.cancelled = False
+
+
+current_guard: ContextVar[Optional[QueryGuard]] = ContextVar(
+    "current_guard", default=None
+)
+
+
+class _StatementWatch:
+    """Per-SQLite-connection state read by its progress handler.
+
+    The handler runs on the driver's thread, so it cannot see the request's
+    context; the statement's guard and deadline are copied here instead.
+    """
+
+    def __init__(self):
+        self.guard: Optional[QueryGuard] = None
+        self.deadline: Optional[float] = None
+        self.timed_out = False
+
+    def start(self, guard: QueryGuard):
+        self.guard = guard
+        self.deadline = (
+            time.monotonic() + guard.timeout if guard.timeout else None
+        )
+        self.timed_out = False
+
+    def clear(self):
+        self.guard = None
+        self.deadline = None
+
+    def __call__(self) -> int:
+        guard = self.guard
+        if guard is None:
+            return 0
+        if guard.cancelled:
+            return 1
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.timed_out = True
+            return 1
+        return 0
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, params, context, many):
+    guard = current_guard.get()
+    if guard is None:
+        return
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        watch = conn.info.get("statement_watch")
+        if watch is None:
+            watch = conn.info["statement_watch"] = _StatementWatch()
+            _set_progress_handler(conn.connection.dbapi_connection, watch)
+        watch.start(guard)
+    elif (
+        dialect == "postgresql"
+        and guard.timeout
+        and conn.info.get("statement_timeout_guard") is not guard
+    ):
+        # Scoped to the transaction; forgotten on commit/rollback below
+        cursor.execute(
+            "SELECT set_config('statement_timeout', "
+            f"'{int(guard.timeout * 1000)}', true)"
+        )
+        conn.info["statement_timeout_guard"] = guard
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, params, context, many):
+    watch = conn.info.get("statement_watch")
+    if watch is not None:
+        watch.clear()
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    conn = context.connection
+    if conn is None:
+        return
+    watch = conn.info.get("statement_watch")
+    timed_out = False
+    if watch is not None:
+        timed_out = watch.timed_out
+        if isinstance(context.original_exception, Exception):
+            # Keep the watch armed on cancellation: the statement may still
+            # be running on the driver thread and must see the flag
+            watch.clear()
+    elif conn.dialect.name == "postgresql":
+        timed_out = "statement timeout" in str(context.original_exception)
+    guard = current_guard.get()
+    if timed_out and guard is not None:
+        raise QueryTimeoutError(guard.timeout)
+
+
+def _forget_statement_timeout(conn):
+    if conn.dialect.name == "postgresql" and not conn.invalidated:
+        conn.info.pop("statement_timeout_guard", None)
+
+
+event.listen(Engine, "commit", _forget_statement_timeout)
+event.listen(Engine, "rollback", _forget_statement_timeout)
+
+
+def _set_progress_handler(dbapi_connection, handler):
+    if hasattr(dbapi_connection, "run_async"):
+        dbapi_connection.run_async(
+            lambda driver: driver.set_progress_handler(
+                handler, PROGRESS_INTERVAL
+            )
+        )
+    else:
+        dbapi_connection.set_progress_handler(handler, PROGRESS_INTERVAL)
+
+
+async def query_timeout_handler(request, exc: QueryTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+class QueryTimeoutMiddleware:
+    def __init__(
+        self,
+        app,
+        timeout: float = 0,
+        route_timeouts: Optional[Dict[str, float]] = None,
+        cancel_on_disconnect: bool = True,
+        routes: Sequence[BaseRoute] = (),
+    ):
+        """``route_timeouts`` is keyed by route path template (for example
+        ``/tasks/{task_id}``) and looked up through ``routes``, which
+        should be the app's own list (``app.routes``)."""
+        self.app = app
+        self.timeout = timeout
+        self.route_timeouts = route_timeouts or {}
+        self.cancel_on_disconnect = cancel_on_disconnect
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        guard = QueryGuard(self._timeout_for(scope))
+        reset_token = current_guard.set(guard)
+        try:
+            if (
+                self.cancel_on_disconnect
+                and scope["method"] in CANCELLABLE_METHODS
+            ):
+                await self._call_cancellable(scope, receive, send, guard)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            current_guard.reset(reset_token)
+
+    def _timeout_for(self, scope) -> float:
+        if self.route_timeouts:
+            # Routing runs later; match the same routes in the same order
+            for route in self.routes:
+                match, _ = route.matches(scope)
+                if match is Match.FULL:
+                    return self.route_timeouts.get(
+                        getattr(route, "path", None), self.timeout
+                    )
+        return self.timeout
+
+    async def _call_cancellable(self, scope, receive, send, guard):
+        """Run the app, cancelling it if the client goes away first.
+
+        Only this method reads from the server; messages are relayed to the
+        app through a queue so an ``http.disconnect`` is seen right away.
+        """
+        messages = asyncio.Queue()
+        response_complete = False
+
+        async def send_tracking_completion(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                response_complete = True
+            await send(message)
+
+        async def watch_disconnect() -> bool:
+            """True once the client disconnects; False if it stops
+            watching because the server does not block ``receive()``."""
+            body_complete = False
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    messages.put_nowait(message)
+                    return True
+                if body_complete:
+                    # Another http.request after the last body chunk:
+                    # polling this server would spin, so stop watching
+                    return False
+                messages.put_nowait(message)
+                body_complete = not message.get("more_body", False)
+
+        handler = asyncio.ensure_future(
+            self.app(scope, messages.get, send_tracking_completion)
+        )
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await asyncio.wait(
+                (handler, watcher), return_when=asyncio.FIRST_COMPLETED
+            )
+            disconnected = watcher.done() and watcher.result()
+            if disconnected and not handler.done() and not response_complete:
+                guard.cancelled = True
+                handler.cancel()
+                with suppress(asyncio.CancelledError):
+                    await handler
+                return
+            await handler
+        finally:
+            if not handler.done():
+                # This request itself was cancelled (e.g. by coalescing)
+                guard.cancelled = True
+                handler.cancel()
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
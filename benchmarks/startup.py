@@ -0,0 +1,163 @@
+"""Cold-start benchmark.
+
+Every run starts a fresh interpreter against a fresh SQLite file and times
+the phases a new replica goes through before it is useful:
+
+* ``import``   - importing the modules the app depends on
+* ``app``      - importing ``app.main`` (app construction, route setup)
+* ``startup``  - the ASGI lifespan startup (create_all, warm-up)
+* ``first``    - the first ``GET /tasks`` request
+* ``second``   - the same request again, for comparison
+* ``openapi``  - the first ``GET /openapi.json`` (docs are built lazily)
+
+Usage::
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --check   # exit 1 when over budget
+
+``tests/test_startup.py`` runs the same budget check with the test suite
+when ``RUN_SLOW_TESTS=1`` is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PHASES = ("import", "app", "startup", "first", "second", "openapi")
+# Everything a new replica does before it has answered its first request
+COLD_START_PHASES = ("import", "app", "startup", "first")
+# Budget for the best run's cold start; about twice what it takes on a
+# developer laptop. COLD_START_BUDGET_MS overrides it for slower machines.
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", 2000))
+
+RUN = r"""
+import asyncio, json, time
+
+started = time.perf_counter()
+import fastapi, sqlalchemy.ext.asyncio, pydantic
+import app.config, app.models, app.schemas, app.crud, app.database
+imported = time.perf_counter()
+from app.main import app
+constructed = time.perf_counter()
+
+
+async def lifespan_startup():
+    messages = asyncio.Queue()
+    await messages.put({"type": "lifespan.startup"})
+    started = asyncio.Event()
+
+    async def send(message):
+        if message["type"] == "lifespan.startup.complete":
+            started.set()
+
+    asyncio.ensure_future(app({"type": "lifespan"}, messages.get, send))
+    await started.wait()
+
+
+async def request(path):
+    status = []
+    requested = False
+    responded = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a real server: block until the exchange is over
+        await responded.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif not message.get("more_body", False):
+            responded.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path":
+        path.encode(), "query_string": b"", "root_path": "", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    assert status == [200], (path, status)
+    return time.perf_counter() - start
+
+
+async def main():
+    start = time.perf_counter()
+    await lifespan_startup()
+    startup = time.perf_counter() - start
+    first = await request("/tasks")
+    second = await request("/tasks")
+    openapi = await request("/openapi.json")
+    print(json.dumps({
+        "import": imported - started,
+        "app": constructed - imported,
+        "startup": startup,
+        "first": first,
+        "second": second,
+        "openapi": openapi,
+    }))
+
+
+asyncio.run(main())
+"""
+
+
+def run_once(root: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/bench.db",
+            PYTHONPATH=root,
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", RUN],
+            env=env, cwd=tmp, check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def cold_start_ms(runs: list) -> float:
+    """Cold start of the fastest run; the minimum filters out noise from
+    other work on the machine, not slowness of the app itself."""
+    return min(
+        sum(run[phase] for phase in COLD_START_PHASES) for run in runs
+    ) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Fail if the cold start exceeds --budget-ms",
+    )
+    parser.add_argument(
+        "--budget-ms", type=float, default=COLD_START_BUDGET_MS
+    )
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = [run_once(root) for _ in range(args.runs)]
+    print(f"{'phase':<10}{'median ms':>12}{'min ms':>10}")
+    for phase in PHASES:
+        values = [run[phase] * 1000 for run in runs]
+        print(
+            f"{phase:<10}{statistics.median(values):>12.1f}"
+            f"{min(values):>10.1f}"
+        )
+    cold_start = cold_start_ms(runs)
+    print(f"cold start {cold_start:.1f} ms (budget {args.budget_ms:g} ms)")
+    if args.check and cold_start > args.budget_ms:
+        raise SystemExit("Cold start is over budget")
+
+
+if __name__ == "__main__":
+    main()
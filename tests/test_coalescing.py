@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.coalescing import CoalescingMiddleware
+
+
+def make_app(**options):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/count")
+    async def count(n: int = 0, m: int = 0):
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        return {"calls": app.state.calls, "n": n, "m": m}
+
+    @app.post("/count")
+    async def write():
+        return {}
+
+    middleware = CoalescingMiddleware(app, paths=["/count"], **options)
+    return app, middleware
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_reads_share_one_execution():
+    app, middleware = make_app()
+    transport = ASGITransport(app=middleware)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        responses = await asyncio.gather(
+            *(ac.get("/count?n=1&m=2") for _ in range(9)),
+            ac.get("/count?m=2&n=1"),
+            ac.get("/count?n=2&m=2"),
+        )
+
+    assert app.state.calls == 2
+    bodies = [response.json() for response in responses]
+    assert bodies[:10] == [bodies[0]] * 10
+    assert bodies[0]["n"] == 1
+    assert bodies[10]["n"] == 2
+    outcomes = [response.headers["x-coalesced"] for response in responses]
+    assert sorted(outcomes) == ["joined"] * 9 + ["leader"] * 2
+    assert middleware.stats.as_dict() == {
+        "requests": 11,
+        "executed": 2,
+        "joined": 9,
+        "cached": 0,
+        "coalescing_ratio": 9 / 11,
+    }
+
+
+@pytest.mark.asyncio
+async def test_micro_cache_and_write_bypass():
+    app, middleware = make_app(cache_seconds=60)
+    transport = ASGITransport(app=middleware)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await ac.get("/count")
+        second = await ac.get("/count")
+        assert second.headers["x-coalesced"] == "cached"
+        assert second.json() == first.json()
+
+        assert (await ac.post("/count")).status_code == 200
+        third = await ac.get("/count")
+
+    assert third.headers["x-coalesced"] == "leader"
+    assert third.json()["calls"] == 2
+
+
+@pytest.mark.asyncio
+async def test_flight_cancelled_when_every_waiter_disconnects():
+    app, middleware = make_app()
+    finished = []
+
+    async def receive():
+        if not finished:
+            finished.append(True)
+            return {"type": "http.request", "body": b""}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise AssertionError("nothing should be sent")
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/count", "headers": [],
+        "query_string": b"", "root_path": "",
+    }
+    await middleware(scope, receive, send)
+    await asyncio.sleep(0.1)
+
+    assert middleware.flights == {}
+    assert app.state.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_server_repeating_requests_does_not_spin():
+    app, middleware = make_app()
+    receives = 0
+
+    async def receive():
+        # Never blocks, as in a naive test harness
+        nonlocal receives
+        receives += 1
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/count", "headers": [],
+        "query_string": b"", "root_path": "",
+    }
+    await asyncio.wait_for(middleware(scope, receive, send), timeout=5)
+
+    assert sent[0]["status"] == 200
+    assert (b"x-coalesced", b"leader") in sent[0]["headers"]
+    assert app.state.calls == 1
+    assert receives == 2
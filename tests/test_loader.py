@@ -0,0 +1,135 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+from app.loader import load
+
+
+def write_users(path):
+    with open(path, "w") as users:
+        for user_id in range(1, 4):
+            users.write(json.dumps({
+                "id": user_id,
+                "name": f"User {user_id}",
+                "email": f"User{user_id}@Example.com",
+            }) + "\n")
+        users.write(json.dumps({"name": "Broken", "email": "not-an-email"}))
+
+
+def write_tasks(path, count):
+    with open(path, "w") as tasks:
+        tasks.write("title,status,due_date,user_id,idempotency_key\n")
+        for number in range(count):
+            status = "done" if number % 2 else "pending"
+            due_date = "2025-12-31" if number % 3 else ""
+            tasks.write(
+                f"Task {number},{status},{due_date},{number % 3 + 1},"
+                f"key-{number}\n"
+            )
+
+
+def test_load_users_and_tasks(tmp_path):
+    database = tmp_path / "load.db"
+    url = f"sqlite+aiosqlite:///{database}"
+    write_users(tmp_path / "users.ndjson")
+    write_tasks(tmp_path / "tasks.csv", 50)
+
+    stats = load(
+        "users", str(tmp_path / "users.ndjson"), database_url=url,
+        workers=1, log=io.StringIO()
+    )
+    assert stats == {"rows": 4, "inserted": 3, "rejected": 1}
+
+    stats = load(
+        "tasks", str(tmp_path / "tasks.csv"), database_url=url,
+        chunk_size=7, transaction_size=20, workers=2, log=io.StringIO()
+    )
+    assert stats == {"rows": 50, "inserted": 50, "rejected": 0}
+
+    with sqlite3.connect(database) as conn:
+        assert conn.execute(
+            "SELECT email FROM users WHERE id = 1"
+        ).fetchone() == ("user1@example.com",)
+        assert conn.execute(
+            "SELECT count(*) FROM tasks WHERE status = 'DONE'"
+        ).fetchone() == (25,)
+        assert conn.execute(
+            "SELECT count(*) FROM tasks WHERE due_date IS NULL"
+        ).fetchone() == (17,)
+        # Secondary indexes are rebuilt after the load
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )}
+        assert {"idx_user_status", "idx_due_date"} <= indexes
+
+
+def test_load_resumes_from_checkpoint(tmp_path):
+    database = tmp_path / "load.db"
+    url = f"sqlite+aiosqlite:///{database}"
+    checkpoint = tmp_path / "tasks.ckpt"
+    write_users(tmp_path / "users.ndjson")
+    write_tasks(tmp_path / "tasks.csv", 30)
+    load(
+        "users", str(tmp_path / "users.ndjson"), database_url=url,
+        workers=1, log=io.StringIO()
+    )
+
+    # Simulate a crash after the first 10 rows were committed
+    checkpoint.write_text(json.dumps(
+        {"source": str(tmp_path / "tasks.csv"), "rows": 10}
+    ))
+    stats = load(
+        "tasks", str(tmp_path / "tasks.csv"), database_url=url,
+        checkpoint=str(checkpoint), workers=1, log=io.StringIO()
+    )
+    assert stats == {"rows": 30, "inserted": 20, "rejected": 0}
+    assert json.loads(checkpoint.read_text())["rows"] == 30
+
+    with sqlite3.connect(database) as conn:
+        assert conn.execute(
+            "SELECT min(title) FROM tasks WHERE idempotency_key = 'key-10'"
+        ).fetchone() == ("Task 10",)
+        assert conn.execute("SELECT count(*) FROM tasks").fetchone() == (20,)
+
+
+def test_load_rejects_foreign_checkpoint(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'load.db'}"
+    checkpoint = tmp_path / "tasks.ckpt"
+    write_tasks(tmp_path / "tasks.csv", 3)
+    checkpoint.write_text(json.dumps(
+        {"source": str(tmp_path / "other.csv"), "rows": 3}
+    ))
+
+    with pytest.raises(ValueError, match="other.csv"):
+        load(
+            "tasks", str(tmp_path / "tasks.csv"), database_url=url,
+            checkpoint=str(checkpoint), workers=1, log=io.StringIO()
+        )
+
+
+def test_load_rejects_tasks_of_unknown_users(tmp_path):
+    database = tmp_path / "load.db"
+    url = f"sqlite+aiosqlite:///{database}"
+    write_users(tmp_path / "users.ndjson")
+    load(
+        "users", str(tmp_path / "users.ndjson"), database_url=url,
+        workers=1, log=io.StringIO()
+    )
+    with open(tmp_path / "tasks.ndjson", "w") as tasks:
+        for user_id in (1, 999, 3):
+            tasks.write(json.dumps({"title": "Task", "user_id": user_id}))
+            tasks.write("\n")
+
+    log = io.StringIO()
+    stats = load(
+        "tasks", str(tmp_path / "tasks.ndjson"), database_url=url,
+        workers=1, log=log
+    )
+    assert stats == {"rows": 3, "inserted": 2, "rejected": 1}
+    assert "row 1: user 999 not found" in log.getvalue()
+    with sqlite3.connect(database) as conn:
+        assert conn.execute(
+            "SELECT count(*) FROM tasks WHERE user_id = 999"
+        ).fetchone() == (0,)
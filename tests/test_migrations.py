@@ -0,0 +1,170 @@
+import re
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.migrations import MigrationError, upgrade
+from app.models import ArchivedTask, Base
+
+# The tables as created before tasks had AUTOINCREMENT (e.g. taskdb.db)
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    email VARCHAR NOT NULL,
+    phone_number VARCHAR,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE INDEX ix_users_id ON users (id);
+CREATE TABLE tasks (
+    id INTEGER NOT NULL,
+    title VARCHAR NOT NULL,
+    status VARCHAR(11) NOT NULL,
+    due_date DATE,
+    idempotency_key VARCHAR,
+    user_id INTEGER NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX idx_due_date ON tasks (due_date);
+CREATE INDEX idx_user_status ON tasks (user_id, status);
+CREATE INDEX ix_tasks_id ON tasks (id);
+CREATE UNIQUE INDEX ix_tasks_idempotency_key ON tasks (idempotency_key);
+"""
+
+
+def create_legacy_database(path, task_count=3):
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute(
+            "INSERT INTO users (name, email) VALUES (?, ?)",
+            ("User", "user@example.com"),
+        )
+        conn.executemany(
+            "INSERT INTO tasks (title, status, user_id) VALUES (?, 'DONE', 1)",
+            [(f"Task {n}",) for n in range(1, task_count + 1)],
+        )
+
+
+async def migrate(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with engine.connect() as conn:
+        await conn.run_sync(upgrade)
+    await engine.dispose()
+
+
+def insert_task(conn, title):
+    conn.execute(
+        "INSERT INTO tasks (title, status, user_id) VALUES (?, 'PENDING', 1)",
+        (title,),
+    )
+    return conn.execute("SELECT max(id) FROM tasks").fetchone()[0]
+
+
+async def test_task_ids_are_not_reused_after_upgrade(tmp_path):
+    database = tmp_path / "legacy.db"
+    create_legacy_database(database)
+    engine = create_engine(f"sqlite:///{database}")
+    ArchivedTask.__table__.create(engine)
+    engine.dispose()
+    with sqlite3.connect(database) as conn:
+        # Archive the newest task; the old schema then reuses its id
+        conn.execute(
+            "INSERT INTO tasks_archive (id, title, status, user_id) "
+            "SELECT id, title, status, user_id FROM tasks WHERE id = 3"
+        )
+        conn.execute("DELETE FROM tasks WHERE id = 3")
+        assert insert_task(conn, "Reused") == 3
+
+    await migrate(database)
+    await migrate(database)
+
+    with sqlite3.connect(database) as conn:
+        table_sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'tasks'"
+        ).fetchone()[0]
+        assert "AUTOINCREMENT" in table_sql
+        assert conn.execute(
+            "SELECT id, title FROM tasks ORDER BY id"
+        ).fetchall() == [(1, "Task 1"), (2, "Task 2"), (3, "Reused")]
+        # The shadowed archived copy moved to a fresh id
+        assert conn.execute(
+            "SELECT id, title FROM tasks_archive"
+        ).fetchall() == [(4, "Task 3")]
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'tasks' "
+            "AND type = 'index'"
+        )}
+        assert {"idx_user_status", "idx_user_due_date"} <= indexes
+
+        conn.execute("DELETE FROM tasks WHERE id = 3")
+        assert insert_task(conn, "New") == 5
+
+
+async def test_emails_are_normalized_and_indexed(tmp_path):
+    database = tmp_path / "legacy.db"
+    create_legacy_database(database)
+    with sqlite3.connect(database) as conn:
+        conn.execute(
+            "INSERT INTO users (name, email) VALUES ('Mixed', ' Mixed@X.com')"
+        )
+
+    await migrate(database)
+
+    with sqlite3.connect(database) as conn:
+        assert conn.execute(
+            "SELECT email FROM users ORDER BY id"
+        ).fetchall() == [("user@example.com",), ("mixed@x.com",)]
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM users "
+            "WHERE lower(email) = 'mixed@x.com'"
+        ).fetchone()[-1]
+        assert "uq_users_email_lower" in plan
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute(
+                "INSERT INTO users (name, email) VALUES ('Dup', 'MIXED@x.com')"
+            )
+
+
+async def test_upgraded_database_is_left_alone(tmp_path):
+    database = tmp_path / "legacy.db"
+    create_legacy_database(database)
+    await migrate(database)
+
+    engine = create_engine(f"sqlite:///{database}")
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with engine.connect() as conn:
+        upgrade(conn)
+    engine.dispose()
+
+    assert statements
+    # No email scan or UPDATE, and no index DDL, against users
+    assert not [s for s in statements if re.search(r"\busers\b", s)]
+
+
+async def test_case_duplicate_emails_stop_the_upgrade(tmp_path):
+    database = tmp_path / "legacy.db"
+    create_legacy_database(database)
+    with sqlite3.connect(database) as conn:
+        conn.execute(
+            "INSERT INTO users (name, email) VALUES (?, ?)",
+            ("Dup", "User@Example.com"),
+        )
+
+    with pytest.raises(MigrationError, match="user@example.com"):
+        await migrate(database)
+    with sqlite3.connect(database) as conn:
+        assert conn.execute("SELECT count(*) FROM users").fetchone() == (2,)
@@ -0,0 +1,77 @@
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from app.database import get_db
+from app.models import User
+from app.profiling import ProfiledRoute, ProfilingMiddleware
+from app.schemas import UserResponse
+
+
+def make_app(async_session, **options):
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/users", response_model=list[UserResponse])
+    async def list_users(db=Depends(get_db)):
+        result = await db.execute(select(User))
+        return list(result.scalars().all())
+
+    async def override_get_db():
+        yield async_session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    return ProfilingMiddleware(app, **options)
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for metric in header.split(", "):
+        name, _, value = metric.partition(";")
+        metrics[name] = value
+    return metrics
+
+
+@pytest.mark.asyncio
+async def test_profile_requested_by_token(async_session, tmp_path):
+    app = make_app(async_session, token="secret", output_dir=str(tmp_path))
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/users")
+        assert "server-timing" not in response.headers
+
+        response = await ac.get("/users", headers={"X-Profile": "wrong"})
+        assert "server-timing" not in response.headers
+
+        response = await ac.get(
+            "/users", headers={"X-Profile": "sécret".encode()}
+        )
+        assert response.status_code == 200
+        assert "server-timing" not in response.headers
+
+        response = await ac.get("/users", headers={"X-Profile": "secret"})
+
+    assert response.status_code == 200
+    metrics = parse_server_timing(response.headers["server-timing"])
+    assert {"db", "app", "validation", "serialization", "total"} <= set(
+        metrics
+    )
+    assert float(metrics["db"].removeprefix("dur=")) > 0
+
+    profile_name = metrics["profile"].split('"')[1]
+    assert (tmp_path / profile_name).exists()
+    assert list(tmp_path.iterdir()) == [tmp_path / profile_name]
+
+
+@pytest.mark.asyncio
+async def test_profile_sampling(async_session, tmp_path):
+    app = make_app(async_session, sample_rate=3, output_dir=str(tmp_path))
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        responses = [await ac.get("/users") for _ in range(6)]
+
+    profiled = ["server-timing" in r.headers for r in responses]
+    assert profiled == [False, False, True, False, False, True]
+    assert len(list(tmp_path.iterdir())) == 2
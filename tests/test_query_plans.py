@@ -0,0 +1,320 @@
+"""Query-plan regression tests for every crud function.
+
+Each case runs a crud call against a seeded database, captures the SQL it
+emits and checks SQLite's ``EXPLAIN QUERY PLAN`` for it. A plan fails if it
+scans a whole table (``SCAN <table>``, with or without an index) or sorts
+into a temporary B-tree, unless the case lists that step as expected.
+Expected steps are limited to cross-user reads that are bounded by LIMIT or
+have to read everything anyway.
+
+The app never runs ANALYZE, so neither do these tests: plans are the ones
+SQLite picks without statistics, as in production.
+"""
+import inspect
+import re
+import shutil
+from datetime import date, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import crud
+from app.models import ArchivedTask, Base, Task, TaskStatus, User
+from app.schemas import (
+    TaskBulkUpdate, TaskCreate, TaskUpdate, UserCreate, UserUpdate
+)
+
+USER_COUNT = 200
+TASK_COUNT = 20000
+ARCHIVED_COUNT = 2000
+ARCHIVED_ID_BASE = 100000
+USER_ID = 7
+TASK_ID = 42
+ARCHIVED_ID = ARCHIVED_ID_BASE + 42
+
+FULL_SCAN = re.compile(rf"SCAN ({'|'.join(Base.metadata.tables)})\b")
+# Cross-user task listings walk the table (or a due-date index) until
+# LIMIT rows match
+LISTING_SCANS = ("SCAN tasks", "SCAN tasks_archive")
+
+
+@pytest.fixture(scope="module")
+def seeded_database(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_engine(f"sqlite:///{path}")
+    statuses = list(TaskStatus)
+    start = date(2025, 1, 1)
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        conn.execute(insert(User), [
+            {"name": f"User {n}", "email": f"user{n}@example.com"}
+            for n in range(1, USER_COUNT + 1)
+        ])
+        conn.execute(insert(Task), [
+            {
+                "title": f"Task {n}",
+                "status": statuses[n % 3],
+                "due_date": start + timedelta(days=n % 365) if n % 4 else None,
+                "idempotency_key": f"key-{n}" if n % 5 == 0 else None,
+                "user_id": n % USER_COUNT + 1,
+            }
+            for n in range(1, TASK_COUNT + 1)
+        ])
+        conn.execute(insert(ArchivedTask), [
+            {
+                "id": ARCHIVED_ID_BASE + n,
+                "title": f"Archived {n}",
+                "status": TaskStatus.DONE,
+                "due_date": start + timedelta(days=n % 365),
+                "idempotency_key": f"archived-key-{n}",
+                "user_id": n % USER_COUNT + 1,
+            }
+            for n in range(1, ARCHIVED_COUNT + 1)
+        ])
+    engine.dispose()
+    return path
+
+
+@pytest_asyncio.fixture
+async def plan_engine(seeded_database, tmp_path):
+    # A fresh copy per case, since many crud calls commit
+    path = shutil.copy(seeded_database, tmp_path / "plans.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    yield engine
+    await engine.dispose()
+
+
+async def _collect(summaries):
+    return [summary async for summary in summaries]
+
+
+def _case(call, *expected, id):
+    return pytest.param(call, expected, id=id)
+
+
+def _get_tasks_cases():
+    for user_id in (None, USER_ID):
+        for status in (None, TaskStatus.PENDING):
+            for order_by in (None, "asc", "desc"):
+                for include_archived in (False, True):
+                    yield _case(
+                        lambda db, options=dict(
+                            user_id=user_id,
+                            status=status,
+                            order_by=order_by,
+                            include_archived=include_archived,
+                        ): crud.get_tasks(db, **options),
+                        *(() if user_id else LISTING_SCANS),
+                        id=(
+                            f"get_tasks-user={user_id}-status="
+                            f"{status and status.value}-order={order_by}"
+                            f"-archived={include_archived}"
+                        ),
+                    )
+
+
+CASES = [
+    _case(lambda db: crud.get_user(db, USER_ID), id="get_user"),
+    _case(
+        lambda db: crud.get_users_by_ids(db, [1, USER_ID, 9999]),
+        id="get_users_by_ids",
+    ),
+    _case(
+        lambda db: crud.get_user_by_email(db, "USER7@example.com"),
+        id="get_user_by_email",
+    ),
+    # The first page walks users in id order and stops at LIMIT
+    _case(lambda db: crud.get_users(db), "SCAN users", id="get_users"),
+    _case(
+        lambda db: crud.get_users(db, after_id=100),
+        id="get_users-after_id",
+    ),
+    _case(
+        lambda db: crud.get_users_with_task_counts(db),
+        "SCAN users",
+        id="get_users_with_task_counts",
+    ),
+    _case(
+        lambda db: crud.get_users_with_task_counts(db, after_id=100),
+        id="get_users_with_task_counts-after_id",
+    ),
+    _case(
+        lambda db: crud.create_user(
+            db, UserCreate(name="New", email="new@example.com")
+        ),
+        id="create_user",
+    ),
+    _case(
+        lambda db: crud.update_user(db, USER_ID, UserUpdate(name="Renamed")),
+        id="update_user",
+    ),
+    _case(lambda db: crud.delete_user(db, USER_ID), id="delete_user"),
+    _case(
+        lambda db: crud.get_task(db, TASK_ID, include_user=True),
+        id="get_task",
+    ),
+    _case(
+        lambda db: crud.get_task(
+            db, ARCHIVED_ID, include_user=True, include_archived=True
+        ),
+        id="get_task-archived",
+    ),
+    _case(
+        lambda db: crud.get_archived_task(db, ARCHIVED_ID, include_user=True),
+        id="get_archived_task",
+    ),
+    _case(
+        lambda db: crud.get_tasks_by_ids(
+            db, [TASK_ID, ARCHIVED_ID], include_user=True,
+            include_archived=True
+        ),
+        id="get_tasks_by_ids",
+    ),
+    *_get_tasks_cases(),
+    _case(
+        lambda db: crud.create_task(
+            db, TaskCreate(title="New", user_id=USER_ID), "new-key"
+        ),
+        id="create_task",
+    ),
+    _case(
+        lambda db: crud.update_task(db, TASK_ID, TaskUpdate(title="Edited")),
+        id="update_task",
+    ),
+    _case(
+        lambda db: crud.bulk_update_tasks(db, TaskBulkUpdate(
+            ids=[1, 2, TASK_ID], update=TaskUpdate(title="Bulk")
+        )),
+        id="bulk_update_tasks-ids",
+    ),
+    _case(
+        lambda db: crud.bulk_update_tasks(db, TaskBulkUpdate(
+            user_id=USER_ID, status=TaskStatus.PENDING,
+            update=TaskUpdate(status=TaskStatus.DONE), return_rows=True
+        )),
+        id="bulk_update_tasks-user-status",
+    ),
+    _case(
+        lambda db: crud.bulk_update_tasks(db, TaskBulkUpdate(
+            due_from=date(2025, 3, 1), due_to=date(2025, 3, 7),
+            update=TaskUpdate(title="Bulk")
+        )),
+        id="bulk_update_tasks-due-range",
+    ),
+    _case(lambda db: crud.delete_task(db, TASK_ID), id="delete_task"),
+    _case(
+        lambda db: crud.delete_task(db, ARCHIVED_ID),
+        id="delete_task-archived",
+    ),
+    _case(
+        lambda db: crud.get_task_by_idempotency_key(db, "key-40"),
+        id="get_task_by_idempotency_key",
+    ),
+    _case(
+        lambda db: crud.get_task_by_idempotency_key(db, "archived-key-4"),
+        id="get_task_by_idempotency_key-archived",
+    ),
+    # Counting every task reads every index entry; the GROUP BY sorts the
+    # three statuses
+    _case(
+        lambda db: crud.get_tasks_summary(db, include_archived=True),
+        "SCAN tasks", "SCAN tasks_archive", "USE TEMP B-TREE FOR GROUP BY",
+        id="get_tasks_summary",
+    ),
+    _case(
+        lambda db: crud.get_tasks_summary(
+            db, user_id=USER_ID, include_archived=True
+        ),
+        id="get_tasks_summary-user",
+    ),
+    _case(
+        lambda db: _collect(crud.iter_user_summaries(db, [1, USER_ID, 9])),
+        id="iter_user_summaries",
+    ),
+    # Date buckets are computed, so no index can deliver them in order;
+    # only the requested users' tasks are sorted
+    *(
+        _case(
+            lambda db, bucket_by=bucket_by, bucket=bucket: _collect(
+                crud.iter_user_summaries(
+                    db, [1, USER_ID, 9], bucket_by=bucket_by, bucket=bucket
+                )
+            ),
+            "USE TEMP B-TREE FOR GROUP BY",
+            id=f"iter_user_summaries-{bucket_by}-{bucket}",
+        )
+        for bucket_by in ("due_date", "created_at")
+        for bucket in ("day", "week")
+    ),
+    _case(
+        lambda db: crud.archive_done_tasks(db, timedelta(days=-1), 500),
+        id="archive_done_tasks",
+    ),
+    _case(
+        lambda db: crud.get_task_type(db, USER_ID), id="get_task_type-user"
+    ),
+    # Returns every task of one status, so it reads the whole table
+    _case(lambda db: crud.get_task_type(db), "SCAN tasks", id="get_task_type"),
+]
+
+
+async def _explain_queries(engine, call):
+    """Run ``call``; the plan of every query it sent."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().startswith(
+            ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+        ):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            await call(db)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+            plans.append((statement, [row.detail for row in result]))
+    return plans
+
+
+@pytest.mark.parametrize("call, expected", CASES)
+async def test_query_plan(plan_engine, call, expected):
+    plans = await _explain_queries(plan_engine, call)
+    assert plans, "no queries captured"
+
+    problems = []
+    for statement, details in plans:
+        for detail in details:
+            step = detail.split(" USING ")[0]
+            costly = FULL_SCAN.match(step) or step.startswith(
+                "USE TEMP B-TREE"
+            )
+            if costly and step not in expected:
+                statement = " ".join(statement.split())
+                problems.append(f"{detail}\n  in: {statement}")
+    assert not problems, "\n".join(problems)
+
+
+def test_every_crud_function_has_a_plan_case():
+    functions = {
+        name
+        for name, function in inspect.getmembers(crud)
+        if not name.startswith("_")
+        and getattr(function, "__module__", None) == crud.__name__
+        and (
+            inspect.iscoroutinefunction(function)
+            or inspect.isasyncgenfunction(function)
+        )
+    }
+    covered = {case.id.split("-")[0] for case in CASES}
+    assert functions - covered == set()
@@ -0,0 +1,166 @@
+from datetime import date
+
+import pytest
+import pytest_asyncio
+
+from app import read_model
+from app.models import TaskStatus
+from app.read_model import TaskReadModel
+
+
+@pytest_asyncio.fixture
+async def model(monkeypatch):
+    tasks = TaskReadModel()
+    monkeypatch.setattr(read_model, "tasks", tasks)
+    return tasks
+
+
+def test_query_and_summary_match_sql_semantics():
+    tasks = TaskReadModel()
+    tasks.upsert(1, 1, TaskStatus.PENDING, date(2025, 11, 3))
+    tasks.upsert(2, 1, TaskStatus.DONE, None)
+    tasks.upsert(3, 2, TaskStatus.PENDING, date(2025, 11, 1))
+    tasks.upsert(4, 1, TaskStatus.PENDING, date(2025, 11, 2))
+
+    assert tasks.query() == [1, 2, 3, 4]
+    assert tasks.query(user_id=1, status=TaskStatus.PENDING) == [1, 4]
+    # Tasks without a due date sort last either way, like SQLite NULLS
+    assert tasks.query(order_by="asc") == [3, 4, 1, 2]
+    assert tasks.query(order_by="desc") == [1, 4, 3, 2]
+    assert tasks.query(skip=1, limit=2) == [2, 3]
+
+    tasks.upsert(1, 1, TaskStatus.DONE, None)
+    tasks.remove([4])
+    assert tasks.query(user_id=1) == [1, 2]
+    assert tasks.summary(1) == {
+        "pending": 0, "in_progress": 0, "done": 2, "total": 2
+    }
+    assert tasks.summary()["total"] == 3
+
+    tasks.remove_user(1)
+    assert tasks.query() == [3]
+    assert tasks.summary(1)["total"] == 0
+
+
+def test_due_date_order_follows_updates(monkeypatch):
+    monkeypatch.setattr("app.read_model.COMPACT_MIN", 2)
+    tasks = TaskReadModel()
+    for task_id, day in enumerate((5, 3, 5, None, 3, 9), 1):
+        due_date = date(2025, 11, day) if day else None
+        tasks.upsert(task_id, task_id % 2 + 1, TaskStatus.PENDING, due_date)
+
+    # Equal due dates keep id order in both directions
+    assert tasks.query(order_by="asc") == [2, 5, 1, 3, 6, 4]
+    assert tasks.query(order_by="desc") == [6, 1, 3, 2, 5, 4]
+
+    tasks.upsert(6, 1, TaskStatus.PENDING, date(2025, 11, 1))
+    tasks.upsert(2, 1, TaskStatus.PENDING, None)
+    assert tasks.query(order_by="asc") == [6, 5, 1, 3, 2, 4]
+    assert tasks.query(order_by="asc", user_id=2, skip=1) == [1, 3]
+    assert tasks.query(order_by="desc", user_id=1) == [6, 2, 4]
+
+    tasks.remove([1, 5])
+    assert tasks.query(order_by="desc") == [3, 6, 2, 4]
+    assert tasks.dead == 0
+    tasks.upsert(7, 1, TaskStatus.DONE, date(2025, 11, 4))
+    assert tasks.query(order_by="asc") == [6, 7, 3, 2, 4]
+
+
+def test_status_queries_follow_updates(monkeypatch):
+    monkeypatch.setattr("app.read_model.COMPACT_MIN", 2)
+    pending, done = TaskStatus.PENDING, TaskStatus.DONE
+    tasks = TaskReadModel()
+    for task_id, day in enumerate((5, 3, 5, None, 3, 9, 1), 1):
+        due_date = date(2025, 11, day) if day else None
+        status = done if task_id in (2, 6) else pending
+        tasks.upsert(task_id, task_id % 2 + 1, status, due_date)
+
+    assert tasks.query(status=pending) == [1, 3, 4, 5, 7]
+    assert tasks.query(status=pending, skip=1, limit=3) == [3, 4, 5]
+    assert tasks.query(status=pending, order_by="asc") == [7, 5, 1, 3, 4]
+    assert tasks.query(status=pending, order_by="desc") == [1, 3, 5, 7, 4]
+    assert tasks.query(status=pending, user_id=2) == [1, 3, 5, 7]
+    assert tasks.query(status=done, user_id=1, order_by="asc") == [2, 6]
+    assert tasks.query(status=TaskStatus.IN_PROGRESS) == []
+
+    # Status and due date changes move rows between the indexes
+    tasks.upsert(3, 2, done, None)
+    tasks.upsert(2, 1, pending, date(2025, 11, 2))
+    tasks.upsert(7, 2, pending, date(2025, 11, 8))
+    assert tasks.query(status=pending) == [1, 2, 4, 5, 7]
+    assert tasks.query(status=pending, order_by="asc") == [2, 5, 1, 7, 4]
+    assert tasks.query(status=done, order_by="desc") == [6, 3]
+    assert tasks.query(status=done, user_id=2) == [3]
+    assert tasks.query(
+        status=pending, user_id=1, order_by="desc"
+    ) == [2, 4]
+
+    tasks.remove([5])
+    assert tasks.query(status=pending, user_id=2) == [1, 7]
+    tasks.remove([1])
+    assert tasks.dead == 0
+    assert tasks.query(status=pending) == [2, 4, 7]
+    assert tasks.query(status=pending, order_by="desc") == [7, 2, 4]
+    assert tasks.query(status=done, user_id=1) == [6]
+
+
+def test_compaction_keeps_remaining_rows(monkeypatch):
+    monkeypatch.setattr("app.read_model.COMPACT_MIN", 2)
+    tasks = TaskReadModel()
+    for task_id in range(1, 9):
+        tasks.upsert(task_id, task_id % 2, TaskStatus.PENDING, None)
+
+    tasks.remove([1, 2, 3])
+
+    assert tasks.dead == 0
+    assert len(tasks.ids) == 5
+    assert tasks.query() == [4, 5, 6, 7, 8]
+    assert tasks.query(user_id=1) == [5, 7]
+    assert tasks.summary()["pending"] == 5
+
+
+@pytest.mark.asyncio
+async def test_routes_use_read_model(client, model):
+    user = (await client.post(
+        "/users", json={"name": "Reader", "email": "reader@example.com"}
+    )).json()
+    for n, due_date in enumerate(("2025-11-03", "2025-11-01", "2025-11-02")):
+        await client.post("/tasks", json={
+            "title": f"Task {n}", "due_date": due_date, "user_id": user["id"]
+        })
+    tasks = (await client.get("/tasks")).json()
+    await client.patch(f"/tasks/{tasks[0]['id']}", json={"status": "done"})
+    await client.patch("/tasks/bulk", json={
+        "ids": [tasks[1]["id"]], "update": {"status": "in_progress"}
+    })
+    await client.delete(f"/tasks/{tasks[2]['id']}")
+
+    assert len(model) == 2
+    response = await client.get(
+        "/tasks", params={"user_id": user["id"], "order_by": "desc"}
+    )
+    assert [task["title"] for task in response.json()] == ["Task 0", "Task 1"]
+    response = await client.get("/tasks/summary")
+    assert response.json() == {
+        "pending": 0, "in_progress": 1, "done": 1, "total": 2
+    }
+
+    await client.delete(f"/users/{user['id']}")
+    assert len(model) == 0
+    assert (await client.get("/tasks")).json() == []
+
+
+@pytest.mark.asyncio
+async def test_load_from_database(client, async_session):
+    user = (await client.post(
+        "/users", json={"name": "Loader", "email": "loader@example.com"}
+    )).json()
+    await client.post("/tasks", json={
+        "title": "Existing", "status": "done", "user_id": user["id"]
+    })
+
+    tasks = TaskReadModel()
+    await tasks.load(async_session)
+
+    assert len(tasks) == 1
+    assert tasks.summary(user["id"])["done"] == 1
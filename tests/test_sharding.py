@@ -0,0 +1,203 @@
+import sqlite3
+from datetime import timedelta
+
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import crud
+from app.schemas import TaskCreate, TaskUpdate, UserCreate
+from app.sharding import TASK_ID_SHARD_SHIFT, ShardRouter
+from tests.test_migrations import create_legacy_database
+
+
+def shard_urls(tmp_path, count):
+    return [
+        f"sqlite+aiosqlite:///{tmp_path}/shard{n}.db" for n in range(count)
+    ]
+
+
+@pytest_asyncio.fixture
+async def make_router(tmp_path):
+    routers = []
+
+    async def make(shard_count=3):
+        primary, *others = shard_urls(tmp_path, shard_count)
+        router = ShardRouter(create_async_engine(primary), others)
+        await router.init()
+        routers.append(router)
+        return router
+
+    yield make
+    for router in routers:
+        for engine in router.engines.values():
+            await engine.dispose()
+
+
+async def create_users_and_tasks(router, user_count=8):
+    async with router.sessionmaker() as db:
+        users = [
+            await crud.create_user(
+                db, UserCreate(name=f"User {n}", email=f"user{n}@example.com")
+            )
+            for n in range(user_count)
+        ]
+        tasks = {}
+        for user in users:
+            tasks[user.id] = [
+                await crud.create_task(
+                    db,
+                    TaskCreate(
+                        title=f"Task {user.id}.{n}",
+                        status=status,
+                        due_date=f"2025-11-{user.id:02d}",
+                        user_id=user.id,
+                    ),
+                )
+                for n, status in enumerate(("pending", "done"))
+            ]
+    return users, tasks
+
+
+def count_tasks(tmp_path, shard_id):
+    with sqlite3.connect(tmp_path / f"shard{shard_id}.db") as conn:
+        return conn.execute("SELECT count(*) FROM tasks").fetchone()[0]
+
+
+async def test_tasks_are_routed_by_user(make_router, tmp_path):
+    router = await make_router()
+    users, tasks = await create_users_and_tasks(router)
+
+    shards = {router.shard_for_user(user.id) for user in users}
+    assert len(shards) > 1
+    for user in users:
+        shard_id = router.shard_for_user(user.id)
+        for task in tasks[user.id]:
+            assert str(task.id >> TASK_ID_SHARD_SHIFT) == shard_id
+    assert sum(count_tasks(tmp_path, n) for n in range(3)) == 16
+
+    user = users[-1]
+    async with router.sessionmaker() as db:
+        task = await crud.get_task(db, tasks[user.id][0].id, include_user=True)
+        assert task.user.email == user.email
+        user_tasks = await crud.get_tasks(db, user_id=user.id)
+        assert len(user_tasks) == 2
+        summary = await crud.get_tasks_summary(db)
+        assert summary["total"] == 16
+
+
+async def test_scatter_gather_reads(make_router):
+    router = await make_router()
+    users, _ = await create_users_and_tasks(router)
+
+    summary = await router.get_tasks_summary()
+    assert summary == {"pending": 8, "in_progress": 0, "done": 8, "total": 16}
+
+    tasks = await router.get_tasks(skip=2, limit=6, order_by="desc")
+    due_dates = [task.due_date.day for task in tasks]
+    assert due_dates == [7, 7, 6, 6, 5, 5]
+
+    pending = await router.get_tasks(status="pending", limit=100)
+    assert len(pending) == 8
+
+
+async def test_move_user_keeps_task_ids(make_router, tmp_path):
+    router = await make_router()
+    users, tasks = await create_users_and_tasks(router)
+    # Move down to the primary, onto ids below the user's own
+    user = next(user for user in users if router.shard_for_user(user.id) > "0")
+    source = router.shard_for_user(user.id)
+    task_ids = [task.id for task in tasks[user.id]]
+
+    assert await router.move_user(user.id, "0") == 2
+    assert router.shard_for_user(user.id) == "0"
+    assert sum(count_tasks(tmp_path, n) for n in range(3)) == 16
+    with sqlite3.connect(tmp_path / f"shard{source}.db") as conn:
+        assert conn.execute(
+            "SELECT count(*) FROM tasks WHERE user_id = ?", (user.id,)
+        ).fetchone() == (0,)
+
+    async with router.sessionmaker() as db:
+        for task_id in task_ids:
+            task = await crud.get_task(db, task_id, include_user=True)
+            assert task.user.email == user.email
+        assert await crud.update_task(
+            db, task_ids[0], TaskUpdate(title="Renamed")
+        )
+        assert (await crud.get_tasks_summary(db, user_id=user.id))[
+            "total"
+        ] == 2
+        # The primary keeps numbering from its own range
+        task = await crud.create_task(
+            db, TaskCreate(title="New", user_id=user.id)
+        )
+    assert task.id >> TASK_ID_SHARD_SHIFT == 0
+
+    # Both directories survive a restart
+    restarted = await make_router()
+    assert restarted.shard_for_user(user.id) == "0"
+    async with restarted.sessionmaker() as db:
+        assert (await crud.get_task(db, task_ids[0])).title == "Renamed"
+
+    # Moving back home empties the task directory again
+    assert await restarted.move_user(user.id, source) == 3
+    assert restarted.task_directory == {task.id: source}
+    async with restarted.sessionmaker() as db:
+        for task_id in task_ids + [task.id]:
+            assert (await crud.get_task(db, task_id)).user_id == user.id
+
+
+async def test_existing_tasks_are_adopted(make_router, tmp_path):
+    # Everything starts on a primary created before sharding, and before
+    # tasks had AUTOINCREMENT
+    create_legacy_database(tmp_path / "shard0.db", task_count=0)
+    with sqlite3.connect(tmp_path / "shard0.db") as conn:
+        for user_id in range(2, 9):
+            conn.execute(
+                "INSERT INTO users (id, name, email) VALUES (?, ?, ?)",
+                (user_id, f"User {user_id}", f"user{user_id}@example.com"),
+            )
+        conn.executemany(
+            "INSERT INTO tasks (title, status, user_id) "
+            "VALUES ('Task', 'PENDING', ?)",
+            [(user_id,) for user_id in range(1, 9) for _ in range(2)],
+        )
+
+    router = await make_router(shard_count=3)
+    assert {router.shard_for_user(user_id) for user_id in range(1, 9)} == {
+        "0"
+    }
+    assert (await router.get_tasks_summary())["total"] == 16
+    async with router.sessionmaker() as db:
+        task = await crud.create_task(db, TaskCreate(title="New", user_id=1))
+    assert task.id == 17
+
+
+async def test_delete_user_cascades_across_shards(make_router, tmp_path):
+    router = await make_router()
+    users, _ = await create_users_and_tasks(router)
+
+    async with router.sessionmaker() as db:
+        for user in users:
+            assert await crud.delete_user(db, user.id)
+    assert sum(count_tasks(tmp_path, n) for n in range(3)) == 0
+
+
+async def test_archive_runs_on_every_shard(make_router, tmp_path):
+    router = await make_router()
+    async with router.sessionmaker() as db:
+        for n in range(12):
+            user = await crud.create_user(
+                db, UserCreate(name=f"User {n}", email=f"user{n}@example.com")
+            )
+            for _ in range(5):
+                await crud.create_task(db, TaskCreate(
+                    title="Done", status="done", user_id=user.id
+                ))
+    assert len({
+        shard_id for shard_id in range(3) if count_tasks(tmp_path, shard_id)
+    }) == 3
+
+    archived = await router.archive_done_tasks(timedelta(days=-1), 5)
+
+    assert archived == 60
+    assert sum(count_tasks(tmp_path, n) for n in range(3)) == 0
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from benchmarks import startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Spawns three fresh interpreters; opt in with RUN_SLOW_TESTS=1
+@pytest.mark.slow
+@pytest.mark.skipif(
+    not os.environ.get("RUN_SLOW_TESTS"), reason="set RUN_SLOW_TESTS=1"
+)
+def test_cold_start_within_budget():
+    runs = [startup.run_once(ROOT) for _ in range(3)]
+    cold_start = startup.cold_start_ms(runs)
+    assert cold_start <= startup.COLD_START_BUDGET_MS, (
+        f"import + startup + first request took {cold_start:.0f} ms, over "
+        f"the {startup.COLD_START_BUDGET_MS:g} ms budget"
+    )
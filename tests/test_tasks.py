@@ -1,5 +1,7 @@
 import pytest
 
+from app.schemas import MAX_LOOKUP_IDS
+
 
 @pytest.mark.asyncio
 async def test_create_task(client):
@@ -348,3 +350,286 @@ async def test_combined_filters(client):
     assert len(tasks) == 2
     assert tasks[0]["title"] == "Early pending"
     assert tasks[1]["title"] == "Late pending"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_by_ids(client):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+
+    ids = []
+    for title in ("T1", "T2", "T3"):
+        task = (await client.post(
+            "/tasks", json={"title": title, "user_id": user["id"]}
+        )).json()
+        ids.append(task["id"])
+
+    response = await client.patch("/tasks/bulk", json={
+        "ids": ids[:2],
+        "update": {"status": "done"}
+    })
+    assert response.status_code == 200
+    assert response.json() == {"updated": 2, "tasks": None}
+
+    summary = (await client.get("/tasks/summary")).json()
+    assert summary["done"] == 2
+    assert summary["pending"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_by_filter_returns_rows(client):
+    user1 = (await client.post(
+        "/users", json={"name": "User1", "email": "user1@example.com"}
+    )).json()
+    user2 = (await client.post(
+        "/users", json={"name": "User2", "email": "user2@example.com"}
+    )).json()
+
+    await client.post("/tasks", json={
+        "title": "Early", "due_date": "2025-10-25", "user_id": user1["id"]
+    })
+    await client.post("/tasks", json={
+        "title": "Late", "due_date": "2025-12-31", "user_id": user1["id"]
+    })
+    await client.post("/tasks", json={
+        "title": "Other", "due_date": "2025-10-25", "user_id": user2["id"]
+    })
+
+    response = await client.patch("/tasks/bulk", json={
+        "user_id": user1["id"],
+        "status": "pending",
+        "due_to": "2025-11-30",
+        "update": {"status": "in_progress"},
+        "return_rows": True
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 1
+    assert data["tasks"][0]["title"] == "Early"
+    assert data["tasks"][0]["status"] == "in_progress"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_requires_selection(client):
+    response = await client.patch("/tasks/bulk", json={
+        "update": {"status": "done"}
+    })
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_falsy_filters_still_apply(client):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+    await client.post(
+        "/tasks", json={"title": "Task", "user_id": user["id"]}
+    )
+
+    # user_id 0 matches nobody; it must not select every task
+    response = await client.patch("/tasks/bulk", json={
+        "user_id": 0,
+        "update": {"status": "done"}
+    })
+    assert response.status_code == 200
+    assert response.json()["updated"] == 0
+
+    response = await client.patch("/tasks/bulk", json={
+        "ids": list(range(MAX_LOOKUP_IDS + 1)),
+        "update": {"status": "done"}
+    })
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("field", ["title", "status"])
+async def test_bulk_update_rejects_null_for_required_fields(client, field):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+    task = (await client.post(
+        "/tasks", json={"title": "Task", "user_id": user["id"]}
+    )).json()
+
+    response = await client.patch("/tasks/bulk", json={
+        "ids": [task["id"]],
+        "update": {field: None}
+    })
+    assert response.status_code == 422
+    response = await client.patch(
+        f"/tasks/{task['id']}", json={field: None}
+    )
+    assert response.status_code == 422
+
+    # Clearing the optional due date is still allowed
+    response = await client.patch("/tasks/bulk", json={
+        "ids": [task["id"]],
+        "update": {"due_date": None}
+    })
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_archive_done_tasks(client):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+
+    done = (await client.post(
+        "/tasks",
+        json={"title": "Done", "status": "done", "user_id": user["id"]}
+    )).json()
+    await client.post(
+        "/tasks",
+        json={"title": "Pending", "status": "pending", "user_id": user["id"]}
+    )
+
+    response = await client.post("/tasks/archive?older_than_days=0")
+    assert response.status_code == 200
+    assert response.json()["archived"] == 1
+
+    # Hot-path queries only see live tasks
+    tasks = (await client.get("/tasks")).json()
+    assert [task["title"] for task in tasks] == ["Pending"]
+    assert (await client.get("/tasks/summary")).json()["done"] == 0
+
+    # Archived tasks stay reachable
+    response = await client.get(f"/tasks/{done['id']}")
+    assert response.status_code == 200
+    assert response.json()["user"]["name"] == "User"
+
+    tasks = (await client.get("/tasks?include_archived=true")).json()
+    assert len(tasks) == 2
+    summary = (await client.get("/tasks/summary?include_archived=true")).json()
+    assert summary["done"] == 1
+    assert summary["total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_archive_respects_age(client):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+    await client.post(
+        "/tasks",
+        json={"title": "Done", "status": "done", "user_id": user["id"]}
+    )
+
+    response = await client.post("/tasks/archive?older_than_days=30")
+    assert response.json()["archived"] == 0
+    assert (await client.get("/tasks/summary")).json()["done"] == 1
+
+
+@pytest.mark.asyncio
+async def test_user_task_summaries(client):
+    user1 = (await client.post(
+        "/users", json={"name": "User1", "email": "user1@example.com"}
+    )).json()
+    user2 = (await client.post(
+        "/users", json={"name": "User2", "email": "user2@example.com"}
+    )).json()
+    user3 = (await client.post(
+        "/users", json={"name": "User3", "email": "user3@example.com"}
+    )).json()
+
+    for status in ("pending", "pending", "done"):
+        await client.post(
+            "/tasks",
+            json={"title": "T", "status": status, "user_id": user1["id"]}
+        )
+    await client.post(
+        "/tasks",
+        json={"title": "T", "status": "in_progress", "user_id": user2["id"]}
+    )
+
+    response = await client.get(
+        "/tasks/summary/users",
+        params={"user_ids": [user3["id"], user1["id"], user2["id"]]}
+    )
+    assert response.status_code == 200
+    summaries = {row["user_id"]: row for row in response.json()}
+    assert summaries[user1["id"]]["pending"] == 2
+    assert summaries[user1["id"]]["done"] == 1
+    assert summaries[user1["id"]]["total"] == 3
+    assert summaries[user2["id"]]["in_progress"] == 1
+    assert summaries[user3["id"]]["total"] == 0
+
+
+@pytest.mark.asyncio
+async def test_user_task_summaries_bucketed_by_week(client):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+
+    # 2025-10-20 is a Monday; the first two tasks share its week
+    for due_date in ("2025-10-20", "2025-10-26", "2025-10-27"):
+        await client.post("/tasks", json={
+            "title": "T", "due_date": due_date, "user_id": user["id"]
+        })
+
+    response = await client.get(
+        "/tasks/summary/users",
+        params={"user_ids": user["id"], "bucket_by": "due_date",
+                "bucket": "week"}
+    )
+    assert response.status_code == 200
+    buckets = {row["bucket"]: row["total"] for row in response.json()}
+    assert buckets == {"2025-10-20": 2, "2025-10-27": 1}
+
+
+@pytest.mark.asyncio
+async def test_user_task_summaries_streamed(client):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+    await client.post(
+        "/tasks", json={"title": "T", "user_id": user["id"]}
+    )
+
+    user_ids = [user["id"]] + list(range(1000, 1200))
+    response = await client.get(
+        "/tasks/summary/users", params={"user_ids": user_ids}
+    )
+    assert response.status_code == 200
+    summaries = response.json()
+    assert len(summaries) == len(user_ids)
+    assert summaries[0] == {
+        "user_id": user["id"], "bucket": None,
+        "pending": 1, "in_progress": 0, "done": 0, "total": 1
+    }
+
+
+@pytest.mark.asyncio
+async def test_lookup_tasks(client):
+    user = (await client.post(
+        "/users", json={"name": "User", "email": "user@example.com"}
+    )).json()
+    first = (await client.post(
+        "/tasks", json={"title": "First", "user_id": user["id"]}
+    )).json()
+    second = (await client.post(
+        "/tasks", json={"title": "Second", "user_id": user["id"]}
+    )).json()
+
+    response = await client.post(
+        "/tasks/lookup", json={"ids": [second["id"], 9999, first["id"]]}
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["id"] for result in results] == [
+        second["id"], 9999, first["id"]
+    ]
+    assert [result["found"] for result in results] == [True, False, True]
+    assert results[0]["task"]["title"] == "Second"
+    assert results[0]["task"]["user"]["name"] == "User"
+    assert results[1]["task"] is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_is_bounded(client):
+    response = await client.post(
+        "/tasks/lookup", json={"ids": list(range(501))}
+    )
+    assert response.status_code == 422
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from app.database import get_db
+from app.timeouts import (
+    QueryGuard, QueryTimeoutError, QueryTimeoutMiddleware, current_guard,
+    query_timeout_handler
+)
+
+# Counts to 100M in SQLite: most of a minute unless interrupted
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+    "WHERE i < 100000000) SELECT count(*) FROM n"
+)
+
+
+def make_app(async_engine, **options):
+    app = FastAPI()
+    app.add_exception_handler(QueryTimeoutError, query_timeout_handler)
+
+    async def override_get_db():
+        async with async_engine.connect() as conn:
+            yield conn
+
+    @app.get("/slow")
+    async def slow(db=Depends(get_db)):
+        return {"count": (await db.execute(SLOW_QUERY)).scalar()}
+
+    @app.get("/fast")
+    async def fast(db=Depends(get_db)):
+        return {"one": (await db.execute(text("SELECT 1"))).scalar()}
+
+    @app.get("/slow/{label}")
+    async def slow_labelled(label: str, db=Depends(get_db)):
+        return {"count": (await db.execute(SLOW_QUERY)).scalar()}
+
+    app.dependency_overrides[get_db] = override_get_db
+    return QueryTimeoutMiddleware(app, routes=app.routes, **options)
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout(async_session):
+    reset_token = current_guard.set(QueryGuard(timeout=0.05))
+    try:
+        start = time.monotonic()
+        with pytest.raises(QueryTimeoutError):
+            await async_session.execute(SLOW_QUERY)
+        assert time.monotonic() - start < 1
+        await async_session.rollback()
+        # The connection is still usable, and fast statements still pass
+        assert (await async_session.execute(text("SELECT 1"))).scalar() == 1
+    finally:
+        current_guard.reset(reset_token)
+
+
+@pytest.mark.asyncio
+async def test_route_timeout_returns_504(async_engine):
+    app = make_app(async_engine, route_timeouts={"/slow": 0.05})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/slow")
+        assert response.status_code == 504
+        assert (await ac.get("/fast")).json() == {"one": 1}
+
+
+@pytest.mark.asyncio
+async def test_route_timeout_matches_path_template(async_engine):
+    app = make_app(async_engine, route_timeouts={"/slow/{label}": 0.05})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/slow/anything")
+        assert response.status_code == 504
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_query(async_engine):
+    app = make_app(async_engine)
+    sent = []
+
+    async def receive():
+        if not sent:
+            sent.append("request")
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(0.1)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message["type"])
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/slow", "headers": [],
+        "query_string": b"", "root_path": "",
+    }
+    start = time.monotonic()
+    await app(scope, receive, send)
+
+    assert time.monotonic() - start < 1
+    assert sent == ["request"]
+    assert async_engine.pool.checkedout() == 0
+
+
+@pytest.mark.asyncio
+async def test_server_repeating_requests_does_not_spin(async_engine):
+    app = make_app(async_engine)
+    receives = 0
+
+    async def receive():
+        # Never blocks, as in a naive test harness
+        nonlocal receives
+        receives += 1
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/fast", "headers": [],
+        "query_string": b"", "root_path": "",
+    }
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+    assert sent[0]["status"] == 200
+    assert receives == 2
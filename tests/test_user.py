@@ -81,3 +81,69 @@ async def test_delete_user_cascades_tasks(client):
     # Task should be deleted
     task_get = await client.get(f"/tasks/{task_id}")
     assert task_get.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_email_is_normalized_and_case_insensitive(client):
+    response = await client.post(
+        "/users",
+        json={"name": "Mixed", "email": "Mixed.Case@Example.com"}
+    )
+    assert response.status_code == 201
+    assert response.json()["email"] == "mixed.case@example.com"
+
+    response = await client.post(
+        "/users",
+        json={"name": "Other", "email": "MIXED.case@example.COM"}
+    )
+    assert response.status_code == 400
+    assert "already registered" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_lookup_users(client):
+    user = (await client.post(
+        "/users", json={"name": "Found", "email": "found@example.com"}
+    )).json()
+
+    response = await client.post(
+        "/users/lookup", json={"ids": [9999, user["id"]]}
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": 9999, "found": False, "user": None},
+        {"id": user["id"], "found": True, "user": user},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_list_users_with_task_counts(client):
+    users = [
+        (await client.post(
+            "/users", json={"name": f"User {n}", "email": f"u{n}@example.com"}
+        )).json()
+        for n in range(3)
+    ]
+    for status in ("pending", "pending", "done"):
+        await client.post("/tasks", json={
+            "title": "Task", "status": status, "user_id": users[0]["id"]
+        })
+
+    response = await client.get("/users/task-counts", params={"limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert [user["id"] for user in page] == [users[0]["id"], users[1]["id"]]
+    assert page[0]["email"] == "u0@example.com"
+    assert page[0]["task_counts"] == {
+        "pending": 2, "in_progress": 0, "done": 1, "total": 3
+    }
+    assert page[1]["task_counts"]["total"] == 0
+
+    response = await client.get(
+        "/users/task-counts", params={"after_id": page[-1]["id"]}
+    )
+    assert [user["id"] for user in response.json()] == [users[2]["id"]]
+
+    # The plain listing has no counts
+    response = await client.get("/users", params={"after_id": page[-1]["id"]})
+    assert response.json() == [users[2]]